@@ -0,0 +1,163 @@
+from __future__ import annotations
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+
+from app.models.llm import get_chat_model
+
+CONTEXT_WINDOW = os.getenv("CONTEXT_WINDOW", "true").lower() == "true"
+# Ab dieser Größe (Tokens) wird die Historie verdichtet ...
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+# ... und die jüngsten Runden bis zu diesem Budget bleiben wörtlich erhalten
+CONTEXT_KEEP_TOKENS = int(os.getenv("CONTEXT_KEEP_TOKENS", "3000"))
+# Tool-Ergebnisse früherer Runden werden auf diese Länge gekürzt
+CONTEXT_TOOL_MAX_CHARS = int(os.getenv("CONTEXT_TOOL_MAX_CHARS", "1500"))
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", os.getenv("MODEL_NAME", "gpt-4o-mini"))
+
+_TRIMMED = " …[gekürzt]"
+_MESSAGE_OVERHEAD = 4  # role/separator tokens per chat message
+
+_SUMMARY_SYSTEM = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the existing summary with the new messages into one concise summary. "
+    "Keep facts, decisions, open questions, document names and cited sources; drop small talk. "
+    "Answer with the summary only, in the language of the conversation."
+)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken encoding of MODEL_NAME, or None if it cannot be loaded (resolved once per process)."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(os.getenv("MODEL_NAME", "gpt-4o-mini"))
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken lädt die BPE-Dateien beim ersten Aufruf herunter (scheitert offline / hinter Proxy)
+        logging.warning("tiktoken-Encoding nicht verfügbar, schätze Tokens über die Zeichenzahl (len/4).", exc_info=True)
+        return None
+
+
+def _token_len(text: str) -> int:
+    enc = _encoding()
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text))
+
+
+def _text(msg: BaseMessage) -> str:
+    content = msg.content
+    if not isinstance(content, str):
+        content = " ".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    calls = getattr(msg, "tool_calls", None)
+    if calls:
+        content += json.dumps([{"name": c.get("name"), "args": c.get("args")} for c in calls], ensure_ascii=False)
+    return content
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    return sum(_token_len(_text(m)) + _MESSAGE_OVERHEAD for m in messages)
+
+
+def _trim_stale_tools(messages: List[BaseMessage]) -> Dict[str, ToolMessage]:
+    """Shortened replacements (by message id) for large tool results of earlier turns."""
+    last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    out: Dict[str, ToolMessage] = {}
+    for m in messages[:last_human]:
+        if not isinstance(m, ToolMessage) or not m.id or not isinstance(m.content, str):
+            continue
+        if len(m.content) > CONTEXT_TOOL_MAX_CHARS and not m.content.endswith(_TRIMMED):
+            out[m.id] = ToolMessage(
+                content=m.content[:CONTEXT_TOOL_MAX_CHARS] + _TRIMMED,
+                tool_call_id=m.tool_call_id,
+                name=m.name,
+                id=m.id,
+            )
+    return out
+
+
+def _split(messages: List[BaseMessage]) -> int:
+    """Index where the kept window starts: newest whole turns within CONTEXT_KEEP_TOKENS.
+
+    The window always starts at a HumanMessage so tool calls stay paired with their
+    results, and the current turn is kept even if it alone exceeds the budget.
+    """
+    sizes = [_token_len(_text(m)) + _MESSAGE_OVERHEAD for m in messages]
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if not starts:
+        return 0
+    cut = starts[-1]
+    for i in reversed(starts[:-1]):
+        if sum(sizes[i:]) > CONTEXT_KEEP_TOKENS:
+            break
+        cut = i
+    return cut
+
+
+def plan_compaction(messages: List[BaseMessage]) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """Return (messages to fold into the summary, tool messages to replace)."""
+    trimmed = _trim_stale_tools(messages)
+    view = [trimmed.get(m.id or "", m) for m in messages]
+    if count_tokens(view) <= CONTEXT_MAX_TOKENS:
+        return [], list(trimmed.values())
+    old = [m for m in view[: _split(view)] if m.id]
+    old_ids = {m.id for m in old}
+    return old, [t for t in trimmed.values() if t.id not in old_ids]
+
+
+def _summarizer():
+    return get_chat_model(model=CONTEXT_SUMMARY_MODEL, temperature=0)
+
+
+def _summary_prompt(summary: Optional[str], old: List[BaseMessage]) -> list:
+    lines = [f"{m.type}: {_text(m)}" for m in old]
+    return [
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": f"Existing summary:\n{summary or '-'}\n\nNew messages:\n" + "\n".join(lines)},
+    ]
+
+
+def _update(old: List[BaseMessage], replaced: List[BaseMessage], summary: Optional[str]) -> dict:
+    out: dict = {}
+    messages: list = list(replaced)
+    if old and summary:
+        out["summary"] = summary
+        messages = [RemoveMessage(id=m.id) for m in old] + messages  # type: ignore[arg-type]
+    if messages:
+        out["messages"] = messages
+    return out
+
+
+def compact_context(state: dict) -> dict:
+    if not CONTEXT_WINDOW:
+        return {}
+    old, replaced = plan_compaction(state.get("messages", []))
+    summary = None
+    if old:
+        try:
+            ai = _summarizer().invoke(_summary_prompt(state.get("summary"), old))
+            summary = str(ai.content)
+        except Exception:
+            logging.warning("Zusammenfassung der Historie fehlgeschlagen, behalte alle Nachrichten.", exc_info=True)
+    return _update(old, replaced, summary)
+
+
+async def acompact_context(state: dict) -> dict:
+    if not CONTEXT_WINDOW:
+        return {}
+    old, replaced = plan_compaction(state.get("messages", []))
+    summary = None
+    if old:
+        try:
+            ai = await _summarizer().ainvoke(_summary_prompt(state.get("summary"), old))
+            summary = str(ai.content)
+        except Exception:
+            logging.warning("Zusammenfassung der Historie fehlgeschlagen, behalte alle Nachrichten.", exc_info=True)
+    return _update(old, replaced, summary)
@@ -1,22 +1,201 @@
 from __future__ import annotations
+import asyncio
+import json
+import logging
 import os
-from typing import Literal
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+
+from app.models.llm import get_structured_model
 
 ROUTER_MODEL = os.getenv("ROUTER_MODEL", os.getenv("MODEL_NAME", "gpt-4o-mini"))
+# llm: immer LLM-Router | local: nur lokaler Klassifikator | hybrid: lokal, LLM nur bei Unsicherheit
+ROUTER_MODE = os.getenv("ROUTER_MODE", "hybrid").lower()
+ROUTER_EXAMPLES_PATH = os.getenv(
+    "ROUTER_EXAMPLES_PATH", str(Path(__file__).resolve().parent.parent / "prompts" / "router_examples.json")
+)
+ROUTER_CONFIDENCE = float(os.getenv("ROUTER_CONFIDENCE", "0.55"))
+ROUTER_MARGIN = float(os.getenv("ROUTER_MARGIN", "0.05"))
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "1024"))
 
 class RouteDecision(BaseModel):
     route: Literal["direct", "rag", "web", "clarify"] = Field(..., description="Selected path")
     reason: str = Field(..., description="Short rationale")
 
+_SYSTEM = (
+    "You are a Router for a multi-agent chatbot. "
+    "Decide the best route: direct | rag | web | clarify."
+)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class LocalRouter:
+    """Nearest-centroid classifier over the configured embedding model.
+
+    Each route's centroid is the normalized mean of its example utterances. A
+    message is routed locally only if its best cosine similarity reaches
+    ``confidence`` and beats the runner-up by ``margin``; otherwise the caller
+    falls back to the LLM router.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]], *, confidence: float, margin: float) -> None:
+        self.examples = {k: v for k, v in examples.items() if v}
+        self.confidence = confidence
+        self.margin = margin
+        self._routes: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "LocalRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            examples = json.load(f)
+        return cls(examples, confidence=ROUTER_CONFIDENCE, margin=ROUTER_MARGIN)
+
+    def _embeddings(self):
+        from app.vectorstore.retriever import _embedding
+        return _embedding()
+
+    def _ensure_centroids(self) -> np.ndarray:
+        if self._centroids is not None:
+            return self._centroids
+        with self._lock:
+            if self._centroids is None:
+                emb = self._embeddings()
+                routes, rows = [], []
+                for route, texts in self.examples.items():
+                    vecs = np.asarray(emb.embed_documents(list(texts)), dtype=np.float32)
+                    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+                    centroid = vecs.mean(axis=0)
+                    rows.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+                    routes.append(route)
+                self._routes = routes
+                self._centroids = np.vstack(rows)
+        return self._centroids
+
+    def classify(self, text: str) -> Optional[RouteDecision]:
+        if not text.strip() or len(self.examples) < 2:
+            return None
+        from app.vectorstore.retriever import embed_query
+
+        centroids = self._ensure_centroids()
+        q = np.asarray(embed_query(text), dtype=np.float32)
+        q /= np.linalg.norm(q) + 1e-12
+        sims = centroids @ q
+        order = np.argsort(-sims)
+        best, second = float(sims[order[0]]), float(sims[order[1]])
+        if best < self.confidence or best - second < self.margin:
+            return None
+        return RouteDecision(
+            route=self._routes[int(order[0])],  # type: ignore[arg-type]
+            reason=f"local: sim={best:.2f} margin={best - second:.2f}",
+        )
+
+
+class _RouterState:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.cache: "OrderedDict[str, RouteDecision]" = OrderedDict()
+        self.counters: Dict[str, int] = {"cache": 0, "local": 0, "llm": 0, "local_errors": 0}
+        self.routes: Dict[str, int] = {}
+        self.local: Optional[LocalRouter] = None
+        self.local_loaded = False
+
+    def count(self, path: str, decision: RouteDecision) -> None:
+        with self.lock:
+            self.counters[path] = self.counters.get(path, 0) + 1
+            self.routes[decision.route] = self.routes.get(decision.route, 0) + 1
+
+    def remember(self, key: str, decision: RouteDecision) -> None:
+        with self.lock:
+            self.cache[key] = decision
+            self.cache.move_to_end(key)
+            while len(self.cache) > ROUTER_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def cached(self, key: str) -> Optional[RouteDecision]:
+        with self.lock:
+            decision = self.cache.get(key)
+            if decision is not None:
+                self.cache.move_to_end(key)
+            return decision
+
+    def local_router(self) -> Optional[LocalRouter]:
+        if not self.local_loaded:
+            try:
+                self.local = LocalRouter.from_file(ROUTER_EXAMPLES_PATH)
+            except Exception:
+                logging.warning("Router-Beispiele konnten nicht geladen werden, nutze nur den LLM-Router.", exc_info=True)
+                self.local = None
+            self.local_loaded = True
+        return self.local
+
+
+_STATE = _RouterState()
+
+
+def _route_fast(user_text: str) -> tuple[str, Optional[RouteDecision]]:
+    """Cache lookup and local classification; returns (cache key, decision or None)."""
+    key = _normalize(user_text)
+    decision = _STATE.cached(key)
+    if decision is not None:
+        _STATE.count("cache", decision)
+        return key, decision
+    if ROUTER_MODE in ("local", "hybrid"):
+        local = _STATE.local_router()
+        if local is not None:
+            try:
+                decision = local.classify(user_text)
+            except Exception:
+                logging.warning("Lokales Routing fehlgeschlagen, nutze LLM-Router.", exc_info=True)
+                with _STATE.lock:
+                    _STATE.counters["local_errors"] += 1
+                decision = None
+            if decision is None and ROUTER_MODE == "local":
+                decision = RouteDecision(route="direct", reason="local: low confidence")
+            if decision is not None:
+                _STATE.count("local", decision)
+                _STATE.remember(key, decision)
+    return key, decision
+
+
 def route_message(user_text: str) -> RouteDecision:
-    llm = ChatOpenAI(model=ROUTER_MODEL, temperature=0)
-    structured = llm.with_structured_output(RouteDecision)
-    system = (
-        "You are a Router for a multi-agent chatbot. "
-        "Decide the best route: direct | rag | web | clarify."
-    )
-    result = structured.invoke([{"role":"system","content":system},
+    key, decision = _route_fast(user_text)
+    if decision is not None:
+        return decision
+    structured = get_structured_model(RouteDecision, model=ROUTER_MODEL, temperature=0)
+    result = structured.invoke([{"role":"system","content":_SYSTEM},
                                 {"role":"user","content":user_text}])
+    _STATE.count("llm", result)
+    _STATE.remember(key, result)
     return result
+
+
+async def aroute_message(user_text: str) -> RouteDecision:
+    key, decision = await asyncio.to_thread(_route_fast, user_text)
+    if decision is not None:
+        return decision
+    structured = get_structured_model(RouteDecision, model=ROUTER_MODEL, temperature=0)
+    result = await structured.ainvoke([{"role":"system","content":_SYSTEM},
+                                       {"role":"user","content":user_text}])
+    _STATE.count("llm", result)
+    _STATE.remember(key, result)
+    return result
+
+
+def router_stats() -> Dict[str, object]:
+    with _STATE.lock:
+        return {
+            "mode": ROUTER_MODE,
+            "paths": dict(_STATE.counters),
+            "routes": dict(_STATE.routes),
+            "cache_entries": len(_STATE.cache),
+        }
@@ -1,9 +1,9 @@
 from __future__ import annotations
 import os
-from typing import Callable, List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Literal, Optional
 from langchain_core.tools import tool
 from duckduckgo_search import DDGS
-from app.vectorstore.retriever import get_retriever
+from app.vectorstore.retriever import search
 from app.api.docs_registry import list_documents
 
 ENABLE_WEBSEARCH = os.getenv("ENABLE_WEBSEARCH", "false").lower() == "true"
@@ -32,48 +32,24 @@ def retrieve_tool(
     source: str | None = None,
     source_exact: bool = False,
     doc_id: str | None = None,
+    mode: Literal["dense", "bm25", "hybrid"] | None = None,
 ) -> str:
     """Rufe relevante Passagen aus dem lokalen FAISS-Vektorindex ab und liefere formatierte Auszüge mit Quellen.
 
     Optional:
     - doc_id: exakte Einschränkung auf ein Dokument (empfohlen für Reader-Ansicht)
     - source/source_exact: Filterung per Dateiname/Teilstring
+    - mode: 'dense' (semantisch), 'bm25' (exakte Begriffe, z. B. Artikelnummern, Paragraphen) oder 'hybrid' (beides); Standard: RETRIEVAL_MODE
     """
-    retriever = get_retriever(k=k)
-    docs = retriever.invoke(query)
-    if not docs:
+    # doc_id/source werden direkt in der FAISS-Suche angewendet (exakter Top-k je Dokument)
+    try:
+        docs = search(query, k=k, doc_id=doc_id, source=source, source_exact=source_exact, mode=mode)
+    except FileNotFoundError:
         return "Keine Dokumente im Index. Lade zuerst ein Dokument hoch."
-
-    # Erst nach doc_id filtern, bei leeren Treffern optional über Dateinamen fallbacken
-    if doc_id:
-        docs_by_id = [d for d in docs if (getattr(d, 'metadata', {}) or {}).get('doc_id') == doc_id]
-        if not docs_by_id and source:
-            import os as _os
-            src_lower = source.lower()
-            def _match_file(d):
-                meta = getattr(d, 'metadata', {}) or {}
-                s = meta.get('source') or meta.get('file_path') or ''
-                b = _os.path.basename(str(s)).lower()
-                return b == src_lower or src_lower in b
-            docs_by_id = [d for d in docs if _match_file(d)]
-        docs = docs_by_id
-        if not docs:
-            return "Keine Treffer im gewählten Dokument."
-
-    # Falls keine doc_id gegeben war: optional per Dateinamen einschränken
-    if source and not doc_id:
-        import os as _os
-        src_lower = source.lower()
-        def _match(d):
-            meta = getattr(d, 'metadata', {}) or {}
-            srcv = meta.get("source") or meta.get("file_path") or ""
-            base = _os.path.basename(str(srcv))
-            if source_exact:
-                return base.lower() == src_lower or str(srcv).lower() == src_lower
-            return (src_lower in str(srcv).lower()) or (src_lower in base.lower())
-        docs = [d for d in docs if _match(d)]
-        if not docs:
+    if not docs:
+        if doc_id or source:
             return "Keine Treffer im gewählten Dokument."
+        return "Keine Dokumente im Index. Lade zuerst ein Dokument hoch."
 
     return _format_docs(docs)
 
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "true").lower() == "true"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+
+GLOBAL_SCOPE = "__global__"
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+@dataclass
+class _Entry:
+    scope: str
+    version: str
+    question: str
+    answer: str
+    vector: Optional[np.ndarray]
+    created: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class CacheLookup:
+    answer: Optional[str] = None
+    match: Optional[str] = None  # "exact" | "semantic"
+    similarity: Optional[float] = None
+    vector: Optional[np.ndarray] = None
+
+    def meta(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"hit": self.answer is not None}
+        if self.answer is not None:
+            out["match"] = self.match
+            if self.similarity is not None:
+                out["similarity"] = round(self.similarity, 4)
+        return out
+
+
+class AnswerCache:
+    """Answers keyed by (scope, index version, question) with near-duplicate matching.
+
+    ``scope`` is a doc_id or GLOBAL_SCOPE, ``version`` the indexed content version
+    of that scope; entries whose version no longer matches are dropped on access,
+    so reindexing a document invalidates only its answers. Questions match either
+    exactly after normalization or by cosine similarity of their embeddings.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, threshold: float) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._counters: Dict[str, int] = {
+            "hits_exact": 0,
+            "hits_semantic": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidated": 0,
+        }
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        try:
+            from app.vectorstore.retriever import embed_query
+
+            # shared query cache: the retrieval of the same message reuses this vector
+            vec = np.asarray(embed_query(question), dtype=np.float32)
+        except Exception:
+            logging.debug("Antwort-Cache: Embedding fehlgeschlagen, nur exakte Treffer.", exc_info=True)
+            return None
+        return vec / (np.linalg.norm(vec) + 1e-12)
+
+    def _drop(self, key: Tuple[str, str], counter: str) -> None:
+        self._entries.pop(key, None)
+        self._counters[counter] += 1
+
+    def _candidates(self, scope: str, version: str) -> List[_Entry]:
+        """Live entries of a scope; expired or outdated ones are removed on the way."""
+        now = time.monotonic()
+        out = []
+        for key, entry in list(self._entries.items()):
+            if entry.scope != scope:
+                continue
+            if entry.version != version:
+                self._drop(key, "invalidated")
+            elif self.ttl > 0 and now - entry.created > self.ttl:
+                self._drop(key, "expired")
+            else:
+                out.append(entry)
+        return out
+
+    def lookup(self, scope: str, version: str, question: str) -> CacheLookup:
+        norm = normalize_question(question)
+        with self._lock:
+            candidates = self._candidates(scope, version)
+            for entry in candidates:
+                if entry.question == norm:
+                    self._entries.move_to_end((scope, norm))
+                    self._counters["hits_exact"] += 1
+                    return CacheLookup(answer=entry.answer, match="exact", similarity=1.0)
+            with_vectors = [e for e in candidates if e.vector is not None]
+        if not with_vectors:
+            with self._lock:
+                self._counters["misses"] += 1
+            return CacheLookup()
+
+        vec = self._embed(question)
+        if vec is None:
+            with self._lock:
+                self._counters["misses"] += 1
+            return CacheLookup()
+        sims = np.vstack([e.vector for e in with_vectors]) @ vec
+        best = int(np.argmax(sims))
+        with self._lock:
+            if float(sims[best]) >= self.threshold:
+                entry = with_vectors[best]
+                if (scope, entry.question) in self._entries:
+                    self._entries.move_to_end((scope, entry.question))
+                self._counters["hits_semantic"] += 1
+                return CacheLookup(answer=entry.answer, match="semantic", similarity=float(sims[best]), vector=vec)
+            self._counters["misses"] += 1
+        return CacheLookup(vector=vec)
+
+    def store(self, scope: str, version: str, question: str, answer: str, vector: Optional[np.ndarray] = None) -> None:
+        norm = normalize_question(question)
+        if not norm or not answer:
+            return
+        if vector is None:
+            vector = self._embed(question)
+        with self._lock:
+            self._entries[(scope, norm)] = _Entry(scope, version, norm, answer, vector)
+            self._entries.move_to_end((scope, norm))
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, scope: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if scope is None or k[0] == scope]:
+                self._drop(key, "invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["entries"] = len(self._entries)
+        hits = out["hits_exact"] + out["hits_semantic"]
+        total = hits + out["misses"]
+        out["hit_rate"] = round(hits / total, 4) if total else None
+        out["enabled"] = ANSWER_CACHE
+        return out
+
+
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    threshold=ANSWER_CACHE_SIMILARITY,
+)
@@ -1,71 +1,239 @@
 from __future__ import annotations
+import hashlib
 import json
 import os
+import threading
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.filelock import file_lock
 from app.paths import get_docs_dir
 
 DOCS_DIR = get_docs_dir()
 REGISTRY_PATH = DOCS_DIR / "registry.json"
+LOCK_PATH = DOCS_DIR / ".registry.lock"
 
+# registry.json: {doc_id: filename} (älteres Format) oder {doc_id: {"filename", "sha256", "size"}}
+Entry = Dict[str, Any]
 
-def _load() -> Dict[str, str]:
+
+def _entry(value: Any) -> Optional[Entry]:
+    if isinstance(value, str):
+        return {"filename": value}
+    if isinstance(value, dict) and value.get("filename"):
+        entry: Entry = {"filename": str(value["filename"])}
+        if value.get("sha256"):
+            entry["sha256"] = str(value["sha256"])
+            entry["size"] = int(value.get("size") or 0)
+        return entry
+    return None
+
+
+def _load() -> Dict[str, Entry]:
     try:
         with REGISTRY_PATH.open("r", encoding="utf-8") as f:
             data = json.load(f)
             if isinstance(data, dict):
-                return {str(k): str(v) for k, v in data.items()}
-    except FileNotFoundError:
+                entries = {str(k): _entry(v) for k, v in data.items()}
+                return {k: e for k, e in entries.items() if e is not None}
+    except (FileNotFoundError, ValueError):
         pass
     return {}
 
 
-def _save(mapping: Dict[str, str]) -> None:
+def _save(mapping: Dict[str, Entry]) -> None:
     REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with REGISTRY_PATH.open("w", encoding="utf-8") as f:
-        json.dump(mapping, f, ensure_ascii=False, indent=2)
+    tmp = REGISTRY_PATH.with_name(f".{REGISTRY_PATH.name}.{os.getpid()}.tmp")
+    # entries without a hash stay plain filenames, as before
+    data = {k: e if e.get("sha256") else e["filename"] for k, e in mapping.items()}
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, REGISTRY_PATH)
 
 
-def ensure_registry() -> Dict[str, str]:
-    mapping = _load()
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stamp() -> Tuple[Optional[int], Optional[Tuple[int, int]]]:
+    try:
+        dir_mtime: Optional[int] = DOCS_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        dir_mtime = None
+    try:
+        st = REGISTRY_PATH.stat()
+        reg: Optional[Tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        reg = None
+    return dir_mtime, reg
+
+
+def _sync(mapping: Dict[str, Entry]) -> bool:
+    """Add new PDFs, drop entries whose file is gone. Returns True if mapping changed."""
+    DOCS_DIR.mkdir(parents=True, exist_ok=True)
+    files = {p.name for p in DOCS_DIR.iterdir() if p.is_file()}
     # only track PDFs for the reader
-    existing = {p.name for p in DOCS_DIR.iterdir() if p.is_file() and p.suffix.lower() == ".pdf"}
-    # add missing files
-    known_files = set(mapping.values())
-    for fname in sorted(existing):
+    pdfs = {f for f in files if f.lower().endswith(".pdf")}
+    changed = False
+    known_files = {e["filename"] for e in mapping.values()}
+    for fname in sorted(pdfs):
         if fname not in known_files and fname != REGISTRY_PATH.name:
             # new file: assign id
-            doc_id = uuid.uuid4().hex
-            mapping[doc_id] = fname
+            mapping[uuid.uuid4().hex] = {"filename": fname}
+            changed = True
     # remove entries for non-existing files
-    ids_to_remove = [doc_id for doc_id, fname in mapping.items() if fname not in existing]
-    if ids_to_remove:
-        for k in ids_to_remove:
-            mapping.pop(k, None)
-    _save(mapping)
-    return mapping
+    for doc_id in [k for k, e in mapping.items() if e["filename"] not in files]:
+        mapping.pop(doc_id, None)
+        changed = True
+    return changed
+
+
+class DocumentRegistry:
+    """Thread-safe, in-memory doc_id <-> filename mapping backed by registry.json.
+
+    Entries may carry the content hash (sha256, size) of the file, used to
+    detect re-uploads of identical documents.
+    Reads are served from memory with forward and reverse indexes. The disk state
+    is only re-read when the docs directory or registry.json changed (mtime
+    polling), and registry.json is only rewritten on mutation, atomically and
+    under an inter-process file lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, str] = {}
+        self._by_name: Dict[str, str] = {}
+        self._entries: Dict[str, Entry] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._stamp: Optional[Tuple[Optional[int], Optional[Tuple[int, int]]]] = None
+
+    def _install(self, mapping: Dict[str, Entry], stamp) -> None:
+        self._entries = mapping
+        self._by_id = {doc_id: e["filename"] for doc_id, e in mapping.items()}
+        self._by_name = {e["filename"]: doc_id for doc_id, e in mapping.items()}
+        self._by_hash = {e["sha256"]: doc_id for doc_id, e in mapping.items() if e.get("sha256")}
+        self._stamp = stamp
+
+    def _reload(self, mutate=None) -> None:
+        with file_lock(LOCK_PATH):
+            # take the stamp before reading so changes racing with us trigger another refresh
+            dir_mtime, _ = _stamp()
+            mapping = _load()
+            changed = _sync(mapping)
+            if mutate is not None:
+                changed = mutate(mapping) or changed
+            if changed:
+                _save(mapping)
+            self._install(mapping, (dir_mtime, _stamp()[1]))
 
+    def refresh(self, force: bool = False) -> None:
+        if not force and self._stamp is not None and _stamp() == self._stamp:
+            return
+        with self._lock:
+            if force or self._stamp is None or _stamp() != self._stamp:
+                self._reload()
 
-def add_document(filename: str) -> str:
-    mapping = ensure_registry()
-    for k, v in mapping.items():
-        if v == filename:
-            return k
-    doc_id = uuid.uuid4().hex
-    mapping[doc_id] = filename
-    _save(mapping)
-    return doc_id
+    def mapping(self) -> Dict[str, str]:
+        self.refresh()
+        return dict(self._by_id)
+
+    def get_filename(self, doc_id: str) -> Optional[str]:
+        self.refresh()
+        return self._by_id.get(doc_id)
+
+    def get_doc_id(self, filename: str) -> Optional[str]:
+        self.refresh()
+        return self._by_name.get(filename)
+
+    def add(self, filename: str, *, sha256: Optional[str] = None, size: int = 0) -> str:
+        doc_id = self.get_doc_id(filename)
+        if doc_id and (sha256 is None or self._entries.get(doc_id, {}).get("sha256") == sha256):
+            return doc_id
+        result: Dict[str, str] = {}
+
+        def _add(mapping: Dict[str, Entry]) -> bool:
+            for k, e in mapping.items():
+                if e["filename"] == filename:
+                    result["id"] = k
+                    break
+            else:
+                result["id"] = uuid.uuid4().hex
+            entry: Entry = {"filename": filename}
+            if sha256:
+                entry.update(sha256=sha256, size=size)
+            elif result["id"] in mapping:
+                return False
+            # a replaced file keeps its doc_id, only the hash changes
+            changed = mapping.get(result["id"]) != entry
+            mapping[result["id"]] = entry
+            return changed
+
+        with self._lock:
+            self._reload(_add)
+        return result["id"]
+
+    def find_by_hash(self, sha256: str, size: int) -> Optional[Tuple[str, str]]:
+        """(doc_id, filename) of a registered document with this content, if any.
+
+        Entries from before hashes were recorded are hashed lazily, but only
+        when their file has the same size.
+        """
+        self.refresh()
+        doc_id = self._by_hash.get(sha256)
+        if doc_id is not None:
+            fname = self._by_id.get(doc_id)
+            try:
+                if fname and (DOCS_DIR / fname).stat().st_size == size:
+                    return doc_id, fname
+            except FileNotFoundError:
+                pass
+        for doc_id, entry in list(self._entries.items()):
+            if entry.get("sha256"):
+                continue
+            path = DOCS_DIR / entry["filename"]
+            try:
+                if path.stat().st_size != size:
+                    continue
+                digest = file_sha256(path)
+            except OSError:
+                continue
+            self.add(entry["filename"], sha256=digest, size=size)
+            if digest == sha256:
+                return doc_id, entry["filename"]
+        return None
+
+
+_REGISTRY = DocumentRegistry()
+
+
+def ensure_registry() -> Dict[str, str]:
+    _REGISTRY.refresh(force=True)
+    return _REGISTRY.mapping()
+
+
+def add_document(filename: str, *, sha256: Optional[str] = None, size: int = 0) -> str:
+    return _REGISTRY.add(filename, sha256=sha256, size=size)
+
+
+def find_document_by_hash(sha256: str, size: int) -> Optional[Tuple[str, str]]:
+    return _REGISTRY.find_by_hash(sha256, size)
 
 
 def get_filename(doc_id: str) -> Optional[str]:
-    mapping = ensure_registry()
-    return mapping.get(doc_id)
+    return _REGISTRY.get_filename(doc_id)
+
+
+def get_doc_id(filename: str) -> Optional[str]:
+    return _REGISTRY.get_doc_id(filename)
 
 
 def list_documents() -> List[dict]:
-    mapping = ensure_registry()
+    mapping = _REGISTRY.mapping()
     out: List[dict] = []
     for doc_id, filename in mapping.items():
         # only expose PDFs
@@ -0,0 +1,195 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.api.docs_registry import ensure_registry
+from app.paths import resolve_project_path
+from app.vectorstore.ingest import build_index, update_index
+
+# Uploads innerhalb dieses Fensters werden zu einem Index-Update zusammengefasst
+INGEST_DEBOUNCE_SECONDS = float(os.getenv("INGEST_DEBOUNCE_SECONDS", "1.0"))
+INGEST_JOBS_KEEP = int(os.getenv("INGEST_JOBS_KEEP", "500"))
+# Job-Status als JSON, damit GET /jobs/{id} auf jedem Worker-Prozess antwortet
+INGEST_JOBS_DIR = resolve_project_path(os.getenv("INGEST_JOBS_DIR", "data/jobs"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class IngestJob:
+    def __init__(self, kind: str, *, filename: Optional[str] = None, doc_id: Optional[str] = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind  # update | full
+        self.filename = filename
+        self.doc_id = doc_id
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.run_id: Optional[str] = None
+        self.progress: Dict[str, Any] = {}
+        self.summary: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            # Jobs eines Laufs wurden zu einem Index-Update zusammengefasst
+            "run_id": self.run_id,
+            "progress": self.progress,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class IngestQueue:
+    """Single background writer for the index.
+
+    Jobs submitted while the worker is busy (or within INGEST_DEBOUNCE_SECONDS
+    of each other) are coalesced into one run: one ``update_index()``, or one
+    ``build_index()`` if any of them asked for a full rebuild. Across processes
+    the ingest functions serialize on the index writer lock; readers keep
+    serving the previous generation until the run publishes a new one.
+    """
+
+    def __init__(self, jobs_dir: Path = INGEST_JOBS_DIR) -> None:
+        self.jobs_dir = jobs_dir
+        self._cond = threading.Condition()
+        self._pending: List[IngestJob] = []
+        self._jobs: Dict[str, IngestJob] = {}
+        self._worker: Optional[threading.Thread] = None
+        self._counters = {"submitted": 0, "runs": 0, "failed_runs": 0}
+
+    def submit(self, kind: str = "update", *, filename: Optional[str] = None, doc_id: Optional[str] = None) -> IngestJob:
+        job = IngestJob(kind, filename=filename, doc_id=doc_id)
+        with self._cond:
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            self._counters["submitted"] += 1
+            self._trim()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._loop, name="ingest-worker", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        self._persist(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.as_dict()
+        # Job eines anderen Worker-Prozesses
+        try:
+            with (self.jobs_dir / f"{job_id}.json").open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out: Dict[str, Any] = dict(self._counters)
+            out["pending"] = len(self._pending)
+            out["running"] = sum(1 for j in self._jobs.values() if j.status == RUNNING)
+        return out
+
+    def _trim(self) -> None:
+        finished = [j for j in self._jobs.values() if j.status in (DONE, FAILED)]
+        for job in sorted(finished, key=lambda j: j.created)[: max(0, len(self._jobs) - INGEST_JOBS_KEEP)]:
+            del self._jobs[job.id]
+        # Statusdateien aller Prozesse: nur die neuesten INGEST_JOBS_KEEP behalten
+        try:
+            files = sorted(self.jobs_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[: max(0, len(files) - INGEST_JOBS_KEEP)]:
+            path.unlink(missing_ok=True)
+
+    def _persist(self, job: IngestJob) -> None:
+        try:
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.jobs_dir / f".{job.id}.{os.getpid()}.tmp"
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(job.as_dict(), f, ensure_ascii=False)
+            os.replace(tmp, self.jobs_dir / f"{job.id}.json")
+        except OSError:
+            logging.warning(f"Job-Status {job.id} konnte nicht gespeichert werden.", exc_info=True)
+
+    def _take_batch(self) -> List[IngestJob]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Burst abwarten: solange neue Jobs eintreffen, noch nicht starten
+            while True:
+                seen = len(self._pending)
+                self._cond.wait(INGEST_DEBOUNCE_SECONDS)
+                if len(self._pending) == seen:
+                    break
+            batch, self._pending = self._pending, []
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._take_batch()
+            try:
+                self._run(batch)
+            except Exception:  # pragma: no cover - _run records failures itself
+                logging.exception("Ingest-Worker: unerwarteter Fehler")
+
+    def _run(self, batch: List[IngestJob]) -> None:
+        run_id = uuid.uuid4().hex[:12]
+        full = any(j.kind == "full" for j in batch)
+        started = time.time()
+        for job in batch:
+            job.status, job.started, job.run_id = RUNNING, started, run_id
+            self._persist(job)
+        last_persist = 0.0
+
+        def progress(data: Dict[str, Any]) -> None:
+            nonlocal last_persist
+            for job in batch:
+                job.progress = dict(data)
+            now = time.monotonic()
+            if now - last_persist >= 1.0 or data.get("phase") == "publishing":
+                last_persist = now
+                for job in batch:
+                    self._persist(job)
+
+        logging.info(f"Ingest-Lauf {run_id}: {len(batch)} Job(s), {'voll' if full else 'inkrementell'}")
+        try:
+            summary = build_index(progress=progress) if full else update_index(progress=progress)
+            summary = summary or {"mode": "full", "chunks": 0}
+            ensure_registry()
+            status, error = DONE, None
+            with self._cond:
+                self._counters["runs"] += 1
+        except Exception as exc:
+            logging.error(f"Ingest-Lauf {run_id} fehlgeschlagen: {exc}", exc_info=True)
+            summary, status, error = None, FAILED, str(exc)
+            with self._cond:
+                self._counters["failed_runs"] += 1
+        finished = time.time()
+        for job in batch:
+            job.status, job.summary, job.error, job.finished = status, summary, error, finished
+            if status == DONE:
+                job.progress = dict(job.progress, phase="done")
+            self._persist(job)
+            job._done.set()
+
+
+ingest_queue = IngestQueue()
@@ -1,20 +1,49 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+import itertools
+import json
 import os
+import threading
+import time
+import uuid
 from pathlib import Path
+from typing import Any, AsyncIterator, Literal
+import aiofiles
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, File, UploadFile
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
-from app.graph import get_graph
-from app.vectorstore.ingest import build_index
+from app.graph import ahas_history, aget_graph, arecord_turn, get_graph, has_history, record_turn, tool_stats
+from app.api.ingest_jobs import FAILED, ingest_queue
 from app.logging_config import setup_logging
 from app.paths import get_docs_dir
-from app.api.docs_registry import ensure_registry, add_document, get_filename, list_documents
+from app.api.docs_registry import (
+    add_document,
+    ensure_registry,
+    find_document_by_hash,
+    get_doc_id,
+    get_filename,
+    list_documents,
+)
+from app.api.answer_cache import ANSWER_CACHE, GLOBAL_SCOPE, answer_cache
 from app.agents.tools import retrieve_tool
+from app.agents.router import router_stats
+from app.models.llm import get_chat_model, llm_stats
+from app.vectorstore.retriever import (
+    RETRIEVAL_MODE,
+    index_version,
+    prewarm_query_cache,
+    query_cache_stats,
+    search_batch,
+    vectorstore_stats,
+)
+from app.vectorstore.embedding_cache import embedding_cache_stats
+from app.vectorstore.page_cache import load_pages
+from app.telemetry import HTTP_SECONDS, TelemetryCallbackHandler, render_metrics, request_trace, span
 import logging
 
 setup_logging()
@@ -25,6 +54,13 @@ BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 UPLOAD_DIR = get_docs_dir()
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Uploads werden blockweise auf die Platte gestreamt; größere Dateien werden mit 413 abgelehnt
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "200"))
+UPLOAD_CHUNK_BYTES = 1 << 20
+# versteckt: wird weder indiziert noch in der Registry geführt
+_UPLOAD_TMP = UPLOAD_DIR / ".uploads"
+# Obergrenze je POST /retrieve/batch; größere Auswertungen in mehreren Anfragen schicken
+RETRIEVE_BATCH_MAX = int(os.getenv("RETRIEVE_BATCH_MAX", "1000"))
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 app.mount("/data", StaticFiles(directory=str(UPLOAD_DIR)), name="data")
 
@@ -40,6 +76,23 @@ try:
 except Exception as _e:
     pass
 
+# Query-Embedding-Cache aus einem Log (eine Anfrage je Zeile oder JSON) vorwärmen;
+# läuft im Hintergrund, damit der Start nicht auf die Embeddings wartet
+QUERY_CACHE_PREWARM_FILE = os.getenv("QUERY_CACHE_PREWARM_FILE", "")
+QUERY_CACHE_PREWARM_LIMIT = int(os.getenv("QUERY_CACHE_PREWARM_LIMIT", "1000"))
+
+
+def _prewarm_query_cache() -> None:
+    try:
+        added = prewarm_query_cache(QUERY_CACHE_PREWARM_FILE, QUERY_CACHE_PREWARM_LIMIT)
+        logging.info(f"Query-Cache vorgewärmt: {added} Anfragen aus {QUERY_CACHE_PREWARM_FILE}")
+    except Exception:
+        logging.warning("Query-Cache konnte nicht vorgewärmt werden.", exc_info=True)
+
+
+if QUERY_CACHE_PREWARM_FILE:
+    threading.Thread(target=_prewarm_query_cache, name="query-cache-prewarm", daemon=True).start()
+
 class ChatIn(BaseModel):
     message: str
     # Backwards-compat: old param by filename
@@ -47,119 +100,340 @@ class ChatIn(BaseModel):
     # Preferred: document id
     document_id: str | None = None
     thread_id: str | None = None
+    # Zeitaufschlüsselung (Knoten, Tools, LLM, Retrieval) in meta["timings"] zurückgeben
+    timings: bool = False
 
 class ChatOut(BaseModel):
     answer: str
+    # z. B. {"cache": {"hit": true, "match": "semantic", "similarity": 0.95}, "timings": {...}}
+    meta: dict[str, Any] | None = None
 
-@app.post("/chat", response_model=ChatOut)
-def chat(req: ChatIn):
-    try:
-        # Resolve filename from id if provided
-        file_from_id = None
-        if req.document_id:
-            file_from_id = get_filename(req.document_id)
+class RetrieveQuery(BaseModel):
+    query: str
+    # optional: Suche auf ein Dokument beschränken
+    document_id: str | None = None
 
-        # Use document-scoped thread by default (prefer id)
-        thread_id = req.thread_id or (
-            f"doc:{req.document_id}" if req.document_id else (
-                f"doc:{req.document}" if req.document else "default"
-            )
+class RetrieveBatchIn(BaseModel):
+    queries: list[RetrieveQuery]
+    k: int = 4
+    mode: Literal["dense", "bm25", "hybrid"] | None = None
+    # False: nur Metadaten und Scores (kleinere Antworten bei großen Auswertungen)
+    include_content: bool = True
+
+def _prepare_chat(req: ChatIn) -> tuple[dict, str, str | None]:
+    """Baue Graph-State und thread_id für eine Chat-Anfrage."""
+    # Resolve filename from id if provided
+    file_from_id = None
+    if req.document_id:
+        file_from_id = get_filename(req.document_id)
+
+    # Use document-scoped thread by default (prefer id)
+    thread_id = req.thread_id or (
+        f"doc:{req.document_id}" if req.document_id else (
+            f"doc:{req.document}" if req.document else "default"
         )
+    )
 
-        # If a document is active, add a dynamic system context so agents ground responses
-        state: dict = {"messages": [HumanMessage(content=req.message)]}
-        if req.document_id or req.document:
-            label = req.document_id or req.document
-            preferred_source = file_from_id or req.document
-            logging.debug(f"/chat doc-context label={label} resolved_source={preferred_source} thread={thread_id}")
-            sys_lines = [
-                f"Kontext: Der Nutzer liest aktuell das Dokument '{label}'.",
-                "Beantworte Fragen AUSSCHLIESSLICH anhand dieses Dokuments.",
-                "Regeln:",
-                "1) Nutze das Tool 'retrieve' (gefiltert auf dieses Dokument) um Passagen zu holen.",
-                "2) Keine Inhalte aus anderen Dokumenten oder Weltwissen einmischen.",
-                "3) Wenn keine passenden Passagen im aktuellen Dokument gefunden werden: antworte kurz: 'Keine Treffer im aktuellen Dokument.'",
-            ]
-            if preferred_source:
-                sys_lines.append(
-                    "Wenn du das Tool 'retrieve' verwendest, gib das Argument 'source' mit dem Dateinamen des Dokuments an,"
-                )
-                sys_lines.append(
-                    f"z. B.: retrieve(query=..., k=4, source='{preferred_source}')."
-                )
-            state["system"] = "\n".join(sys_lines)
-            # Router-Hinweis
-            state["doc"] = req.document_id or req.document
-            if req.document_id:
-                state["doc_id"] = req.document_id
-        else:
-            # Global-Dokumenten-Chat: explizit RAG über alle Dokumente bevorzugen
-            state["global_rag"] = True
-
-        # Serverseitiger Doc-RAG-Fallback: Wenn doc_id/source gesetzt sind, hole Passagen direkt und beantworte strikt daraus.
-        answer: str | None = None
-        if req.document_id or req.document:
-            try:
-                tool_args = {"query": req.message, "k": 6}
-                if req.document_id:
-                    tool_args["doc_id"] = req.document_id
-                if file_from_id or req.document:
-                    tool_args["source"] = file_from_id or req.document
-                    tool_args["source_exact"] = True
-                retrieved = retrieve_tool.invoke(tool_args)  # type: ignore
-                # Baue den Kontext primär direkt aus dem PDF
-                context_text: str | None = None
-                base_from_pdf: str | None = None
-                if file_from_id:
-                    try:
-                        from langchain_community.document_loaders import PyPDFLoader  # type: ignore
-                        pdf_path = UPLOAD_DIR / file_from_id
-                        pages = PyPDFLoader(str(pdf_path)).load()
-                        base_from_pdf = "\n\n".join(p.page_content for p in pages[:10])
-                    except Exception:
-                        base_from_pdf = None
-                # Ergänze optional Retrieval-Snippets aus genau diesem Dokument
-                extra = None
-                if isinstance(retrieved, str) and retrieved.strip() and not retrieved.strip().lower().startswith("keine treffer"):
-                    extra = retrieved
-                # Kontext zusammenbauen (PDF-Inhalt hat Priorität)
-                parts = []
-                if base_from_pdf:
-                    parts.append(base_from_pdf[:6000])
-                if extra:
-                    parts.append(extra[:2000])
-                context_text = "\n\n".join(parts) if parts else None
-                # Kurze, strikte Antwort aus Kontext erzeugen
-                if context_text:
-                    llm = ChatOpenAI(model=os.getenv("MODEL_NAME", "gpt-4o-mini"), temperature=0)
-                    sys = (
-                        "Antworte ausschließlich anhand des folgenden Kontexts zum aktuellen PDF. "
-                        "Erfinde nichts. Wenn der Kontext die Frage nicht beantwortet, antworte: 'Keine Treffer im aktuellen Dokument.'"
-                    )
-                    prompt = [
-                        {"role": "system", "content": sys},
-                        {"role": "user", "content": f"Kontext:\n{context_text}\n\nFrage:\n{req.message}"},
-                    ]
-                    ai = llm.invoke(prompt)
-                    answer = ai.content if hasattr(ai, "content") else str(ai)
-            except Exception as _e:
-                # Fallback auf Graph unten
-                pass
-
-        if answer is None:
-            result = graph.invoke(
-                state,
-                config={"configurable": {"thread_id": thread_id}},
+    # If a document is active, add a dynamic system context so agents ground responses
+    # Doc-Felder werden mit dem Thread gespeichert, daher pro Anfrage explizit (zurück)setzen
+    state: dict = {
+        "messages": [HumanMessage(content=req.message)],
+        "doc": None,
+        "doc_id": None,
+        "system": None,
+        "global_rag": False,
+    }
+    if req.document_id or req.document:
+        label = req.document_id or req.document
+        preferred_source = file_from_id or req.document
+        logging.debug(f"/chat doc-context label={label} resolved_source={preferred_source} thread={thread_id}")
+        sys_lines = [
+            f"Kontext: Der Nutzer liest aktuell das Dokument '{label}'.",
+            "Beantworte Fragen AUSSCHLIESSLICH anhand dieses Dokuments.",
+            "Regeln:",
+            "1) Nutze das Tool 'retrieve' (gefiltert auf dieses Dokument) um Passagen zu holen.",
+            "2) Keine Inhalte aus anderen Dokumenten oder Weltwissen einmischen.",
+            "3) Wenn keine passenden Passagen im aktuellen Dokument gefunden werden: antworte kurz: 'Keine Treffer im aktuellen Dokument.'",
+        ]
+        if preferred_source:
+            sys_lines.append(
+                "Wenn du das Tool 'retrieve' verwendest, gib das Argument 'source' mit dem Dateinamen des Dokuments an,"
             )
-            messages = result.get("messages", [])
-            last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
-            answer = last_ai.content if last_ai else "No answer."
-        return ChatOut(answer=answer)  # type: ignore
+            sys_lines.append(
+                f"z. B.: retrieve(query=..., k=4, source='{preferred_source}')."
+            )
+        state["system"] = "\n".join(sys_lines)
+        # Router-Hinweis
+        state["doc"] = req.document_id or req.document
+        if req.document_id:
+            state["doc_id"] = req.document_id
+    else:
+        # Global-Dokumenten-Chat: explizit RAG über alle Dokumente bevorzugen
+        state["global_rag"] = True
+    return state, thread_id, file_from_id
+
+
+def _doc_fallback_prompt(req: ChatIn, file_from_id: str | None) -> list[dict] | None:
+    """Serverseitiger Doc-RAG-Fallback: Passagen direkt holen und einen strikten Prompt daraus bauen."""
+    tool_args = {"query": req.message, "k": 6}
+    if req.document_id:
+        tool_args["doc_id"] = req.document_id
+    if file_from_id or req.document:
+        tool_args["source"] = file_from_id or req.document
+        tool_args["source_exact"] = True
+    retrieved = retrieve_tool.invoke(tool_args)  # type: ignore
+    # Baue den Kontext primär direkt aus dem PDF (Seitentexte aus dem beim Ingest gefüllten Cache)
+    base_from_pdf: str | None = None
+    if file_from_id and req.document_id:
+        try:
+            pages = load_pages(req.document_id, UPLOAD_DIR / file_from_id, max_pages=10, max_chars=6000)
+            base_from_pdf = "\n\n".join(pages)
+        except Exception:
+            base_from_pdf = None
+    # Ergänze optional Retrieval-Snippets aus genau diesem Dokument
+    extra = None
+    if isinstance(retrieved, str) and retrieved.strip() and not retrieved.strip().lower().startswith("keine treffer"):
+        extra = retrieved
+    # Kontext zusammenbauen (PDF-Inhalt hat Priorität)
+    parts = []
+    if base_from_pdf:
+        parts.append(base_from_pdf[:6000])
+    if extra:
+        parts.append(extra[:2000])
+    if not parts:
+        return None
+    context_text = "\n\n".join(parts)
+    # Kurze, strikte Antwort aus Kontext erzeugen
+    sys = (
+        "Antworte ausschließlich anhand des folgenden Kontexts zum aktuellen PDF. "
+        "Erfinde nichts. Wenn der Kontext die Frage nicht beantwortet, antworte: 'Keine Treffer im aktuellen Dokument.'"
+    )
+    return [
+        {"role": "system", "content": sys},
+        {"role": "user", "content": f"Kontext:\n{context_text}\n\nFrage:\n{req.message}"},
+    ]
+
+
+def _doc_scoped(req: ChatIn) -> bool:
+    return bool(req.document_id or req.document)
+
+
+def _cache_scope(req: ChatIn, history: bool) -> tuple[str, str] | None:
+    """(scope, index version) für den Antwort-Cache, oder None wenn nicht cachebar.
+
+    Nur Antworten ohne Bezug zur Thread-Historie sind cachebar: Doc-Antworten aus dem
+    zustandslosen Fallback-Prompt und globale Fragen in einem noch leeren Thread
+    (sonst könnten Rückfragen wie "und was noch?" die Antwort eines anderen Gesprächs erhalten).
+    """
+    if not ANSWER_CACHE:
+        return None
+    if not _doc_scoped(req) and history:
+        return None
+    doc_id = req.document_id or (get_doc_id(req.document) if req.document else None)
+    if _doc_scoped(req) and not doc_id:
+        return None
+    version = index_version(doc_id)
+    if version is None:
+        return None
+    return doc_id or GLOBAL_SCOPE, version
+
+
+def _fallback_llm():
+    return get_chat_model(model=os.getenv("MODEL_NAME", "gpt-4o-mini"), temperature=0)
+
+
+def _meta(req: ChatIn, lookup, trace) -> dict[str, Any] | None:
+    meta: dict[str, Any] = {}
+    if lookup is not None:
+        meta["cache"] = lookup.meta()
+    if req.timings:
+        meta["timings"] = trace.summary()
+    return meta or None
+
+
+@app.middleware("http")
+async def _http_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Routen-Template statt konkretem Pfad, damit die Label-Kardinalität begrenzt bleibt
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+
+@app.post("/chat", response_model=ChatOut)
+def chat(req: ChatIn):
+    try:
+        with request_trace() as trace:
+            return _chat(req, trace)
     except Exception as e:
         logging.error(f"Error in chat endpoint: {e}", exc_info=True)
         return {"answer": "Es ist ein Fehler aufgetreten. Bitte versuchen Sie es später erneut."}
 
 
+def _chat(req: ChatIn, trace) -> ChatOut:
+    state, thread_id, file_from_id = _prepare_chat(req)
+    callbacks = [TelemetryCallbackHandler(trace)]
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": callbacks}
+
+    # Wiederholte Fragen zum selben (unveränderten) Dokument direkt aus dem Antwort-Cache beantworten
+    with span("cache", "answer_lookup"):
+        history = ANSWER_CACHE and not _doc_scoped(req) and has_history(graph, config)
+        scope = _cache_scope(req, history)
+        lookup = answer_cache.lookup(*scope, req.message) if scope else None
+    if lookup is not None and lookup.answer is not None:
+        # Frage und Antwort trotzdem im Thread festhalten, damit Rückfragen Kontext haben
+        record_turn(graph, config, state, lookup.answer)
+        return ChatOut(answer=lookup.answer, meta=_meta(req, lookup, trace))
+
+    # Serverseitiger Doc-RAG-Fallback: Wenn doc_id/source gesetzt sind, hole Passagen direkt und beantworte strikt daraus.
+    answer: str | None = None
+    if _doc_scoped(req):
+        try:
+            prompt = _doc_fallback_prompt(req, file_from_id)
+            if prompt:
+                ai = _fallback_llm().invoke(prompt, config={"callbacks": callbacks})
+                answer = ai.content if hasattr(ai, "content") else str(ai)
+        except Exception as _e:
+            # Fallback auf Graph unten
+            pass
+
+    if answer is None:
+        result = graph.invoke(state, config=config)
+        messages = result.get("messages", [])
+        last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        answer = last_ai.content if last_ai else "No answer."
+        if _doc_scoped(req):
+            scope = None  # Graph-Antwort im Doc-Modus hängt von der Thread-Historie ab
+    if scope and isinstance(answer, str):
+        answer_cache.store(*scope, req.message, answer, lookup.vector if lookup else None)
+    return ChatOut(answer=answer, meta=_meta(req, lookup, trace))  # type: ignore
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    # content blocks (responses API): join text parts
+    return "".join(b.get("text", "") for b in content if isinstance(b, dict))
+
+
+# Graph-Knoten, deren LLM-Tokens zur Antwort gehören (Router-Tokens nicht streamen)
+_ANSWER_NODES = {"direct", "rag", "web"}
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatIn):
+    """Wie /chat, aber als Server-Sent Events.
+
+    Events: ``route`` (Routing-Entscheidung), ``tool_start``/``tool_end``,
+    ``token`` (Antwort-Tokens), ``done`` (vollständige Antwort) und ``error``.
+    """
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            with request_trace() as trace:
+                async for event in _chat_events(req, trace):
+                    yield event
+        except Exception as e:
+            logging.error(f"Error in chat stream endpoint: {e}", exc_info=True)
+            yield _sse("error", {"message": "Es ist ein Fehler aufgetreten. Bitte versuchen Sie es später erneut."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _chat_events(req: ChatIn, trace) -> AsyncIterator[str]:
+    state, thread_id, file_from_id = _prepare_chat(req)
+    callbacks = [TelemetryCallbackHandler(trace)]
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": callbacks}
+    agraph = await aget_graph()
+
+    with span("cache", "answer_lookup"):
+        history = ANSWER_CACHE and not _doc_scoped(req) and await ahas_history(agraph, config)
+        scope = await asyncio.to_thread(_cache_scope, req, history)
+        lookup = await asyncio.to_thread(answer_cache.lookup, *scope, req.message) if scope else None
+    if lookup is not None and lookup.answer is not None:
+        # Frage und Antwort trotzdem im Thread festhalten, damit Rückfragen Kontext haben
+        await arecord_turn(agraph, config, state, lookup.answer)
+        yield _sse("token", {"text": lookup.answer})
+        yield _sse("done", {"answer": lookup.answer, "meta": _meta(req, lookup, trace)})
+        return
+
+    def _remember(answer: str) -> None:
+        if scope:
+            answer_cache.store(*scope, req.message, answer, lookup.vector if lookup else None)
+
+    if _doc_scoped(req):
+        try:
+            prompt = await asyncio.to_thread(_doc_fallback_prompt, req, file_from_id)
+        except Exception:
+            prompt = None
+        if prompt:
+            yield _sse("route", {"route": "rag", "reason": "doc-fallback"})
+            parts: list[str] = []
+            async for chunk in _fallback_llm().astream(prompt, config={"callbacks": callbacks}):
+                text = _chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+            answer = "".join(parts)
+            await asyncio.to_thread(_remember, answer)
+            yield _sse("done", {"answer": answer, "meta": _meta(req, lookup, trace)})
+            return
+
+    # Tokens der letzten Assistenz-Runde (nach dem letzten Tool-Ergebnis) bilden die Antwort
+    if _doc_scoped(req):
+        scope = None  # Graph-Antwort im Doc-Modus hängt von der Thread-Historie ab
+    answer_parts: list[str] = []
+    async for ev in agraph.astream_events(state, config=config, version="v2"):
+        kind = ev.get("event")
+        node = (ev.get("metadata") or {}).get("langgraph_node")
+        if kind == "on_chain_end" and node == "router" and ev.get("name") == "router":
+            output = (ev.get("data") or {}).get("output") or {}
+            if isinstance(output, dict) and output.get("route"):
+                yield _sse("route", {"route": output.get("route")})
+        elif kind == "on_tool_start":
+            answer_parts = []
+            yield _sse("tool_start", {"name": ev.get("name"), "input": (ev.get("data") or {}).get("input")})
+        elif kind == "on_tool_end":
+            output = (ev.get("data") or {}).get("output")
+            text = getattr(output, "content", output)
+            yield _sse("tool_end", {"name": ev.get("name"), "output": str(text)[:500]})
+        elif kind == "on_chat_model_stream" and node in _ANSWER_NODES:
+            text = _chunk_text((ev.get("data") or {}).get("chunk"))
+            if text:
+                answer_parts.append(text)
+                yield _sse("token", {"text": text})
+    answer = "".join(answer_parts)
+    if not answer:
+        # Modelle/Provider ohne Token-Streaming: Antwort aus dem gespeicherten Thread-Zustand
+        messages = (await agraph.aget_state(config)).values.get("messages", [])
+        last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        answer = _chunk_text(last_ai) if last_ai is not None else ""
+        if answer:
+            yield _sse("token", {"text": answer})
+    answer = answer or "No answer."
+    await asyncio.to_thread(_remember, answer)
+    yield _sse("done", {"answer": answer, "meta": _meta(req, lookup, trace)})
+
+
 @app.get("/", response_class=HTMLResponse)
 
 def index(request: Request):
@@ -174,6 +448,57 @@ def get_documents():
     docs = list_documents()
     return {"documents": docs}
 
+@app.get("/stats")
+def get_stats():
+    return {
+        "vectorstore": vectorstore_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "router": router_stats(),
+        "tools": tool_stats(),
+        "llm": llm_stats(),
+        "answer_cache": answer_cache.stats(),
+        "query_cache": query_cache_stats(),
+        "ingest": ingest_queue.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus-Textformat: Latenz-Histogramme (HTTP, Knoten, Tools, LLM, Embeddings, Retrieval) und Token-Zähler."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/retrieve/batch")
+def retrieve_batch(req: RetrieveBatchIn):
+    """Viele Fragen in einem Aufruf gegen den Index (ohne LLM), z. B. für QA-Auswertungen.
+
+    Embeddings werden gebündelt berechnet und per FAISS-Suche über die Query-Matrix
+    ausgewertet; Treffer je Frage mit Score (FAISS-Distanz, BM25 bzw. RRF je nach ``mode``).
+    """
+    if len(req.queries) > RETRIEVE_BATCH_MAX:
+        return JSONResponse(
+            status_code=400, content={"error": f"Höchstens {RETRIEVE_BATCH_MAX} Fragen pro Anfrage."}
+        )
+    if req.k < 1:
+        return JSONResponse(status_code=400, content={"error": "k muss mindestens 1 sein."})
+    try:
+        hits = search_batch(
+            [q.query for q in req.queries],
+            req.k,
+            doc_ids=[q.document_id for q in req.queries],
+            mode=req.mode,
+        )
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Kein Index vorhanden. Lade zuerst ein Dokument hoch."})
+    results = []
+    for q, docs in zip(req.queries, hits):
+        items = []
+        for doc, score in docs:
+            item: dict[str, Any] = {"score": score, "metadata": doc.metadata or {}}
+            if req.include_content:
+                item["content"] = doc.page_content
+            items.append(item)
+        results.append({"query": q.query, "document_id": q.document_id, "hits": items})
+    return {"k": req.k, "mode": req.mode or RETRIEVAL_MODE, "index_version": index_version(), "results": results}
+
 @app.get("/document/{doc_id}")
 def get_document(doc_id: str):
     fname = get_filename(doc_id)
@@ -193,29 +518,125 @@ def data_by_id(doc_id: str):
     return FileResponse(path=str(file_path), media_type="application/pdf")
 
 @app.post("/reindex")
-def reindex():
+def reindex(full: bool = False, wait: bool = True):
+    """Index aktualisieren (über die Ingest-Queue); mit wait=false sofort die Job-ID zurückgeben."""
+    job = ingest_queue.submit("full" if full else "update")
+    if not wait:
+        return {"status": job.status, "job_id": job.id}
+    job.wait()
+    if job.status == FAILED:
+        logging.error(f"Reindex failed: {job.error}")
+        return JSONResponse(status_code=500, content={"error": job.error, "job_id": job.id})
+    return {"status": "ok", "summary": job.summary, "job_id": job.id}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingest_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job nicht gefunden."})
+    return job
+
+def _upload_limit() -> int:
+    return int(MAX_UPLOAD_MB * 1024 * 1024)
+
+
+def _too_large() -> JSONResponse:
+    return JSONResponse(status_code=413, content={"error": f"Datei ist größer als {MAX_UPLOAD_MB:g} MB."})
+
+
+@app.middleware("http")
+async def _reject_large_uploads(request: Request, call_next):
+    # vor dem Multipart-Parsing ablehnen, sonst spoolt Starlette die ganze Datei erst auf die Platte
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > _upload_limit() + (64 << 10):  # + Multipart-Overhead
+            return _too_large()
+    return await call_next(request)
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+async def _stream_upload(file: UploadFile) -> tuple[Path, str, int]:
+    """Write the upload blockwise to a temp file; returns (temp path, sha256, size)."""
+    _UPLOAD_TMP.mkdir(parents=True, exist_ok=True)
+    tmp = _UPLOAD_TMP / f"{uuid.uuid4().hex}.part"
+    limit = _upload_limit()
+    digest = hashlib.sha256()
+    size = 0
     try:
-        build_index()
-        ensure_registry()
-        return {"status": "ok"}
-    except Exception as e:
-        logging.error(f"Reindex failed: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        async with aiofiles.open(tmp, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > limit:
+                    raise _UploadTooLarge()
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp, digest.hexdigest(), size
+
+
+def _place_upload(tmp: Path, filename: str, replace: bool) -> str:
+    """Atomically move the temp file into UPLOAD_DIR; never overwrites another file unless ``replace``.
+
+    A taken name gets a numbered variant ("bericht (2).pdf"), reserved with
+    O_EXCL so concurrent uploads (also from other workers) cannot collide.
+    """
+    if replace:
+        os.replace(tmp, UPLOAD_DIR / filename)
+        return filename
+    stem, suffix = Path(filename).stem, Path(filename).suffix
+    for n in itertools.count(1):
+        name = filename if n == 1 else f"{stem} ({n}){suffix}"
+        try:
+            os.close(os.open(UPLOAD_DIR / name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            continue
+        os.replace(tmp, UPLOAD_DIR / name)
+        return name
+    raise AssertionError("unreachable")
+
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_path = UPLOAD_DIR / file.filename
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    with file_path.open("wb") as buffer:
-        buffer.write(await file.read())
-    if not file_path.exists() or file_path.stat().st_size == 0:
-        logging.error(f"Upload failed or empty file: {file_path}")
-        return JSONResponse(status_code=500, content={"error": "Upload fehlgeschlagen."})
-    # Nach Upload: Index neu aufbauen, damit das Dokument im RAG erscheint
+async def upload_file(file: UploadFile = File(...), replace: bool = False):
+    """Datei speichern und Indizierung einreihen.
+
+    Identischer Inhalt (sha256) wie ein vorhandenes Dokument: nichts wird gespeichert oder neu
+    indiziert, die Antwort verweist auf das vorhandene Dokument (``duplicate: true``).
+    Ein belegter Dateiname wird nur mit ``replace=true`` überschrieben, sonst nummeriert.
+    """
+    filename = Path(file.filename or "").name  # keine Pfadanteile aus dem Client übernehmen
+    if not filename or filename.startswith("."):
+        return JSONResponse(status_code=400, content={"error": "Ungültiger Dateiname."})
     try:
-        doc_id = add_document(file.filename)
-        logging.info(f"Uploaded PDF saved at: {file_path}")
-        build_index()
-    except Exception as e:
-        logging.error(f"Fehler beim Neuaufbau des Index nach Upload: {e}")
-    return {"filename": file.filename, "id": doc_id}
+        tmp, sha256, size = await _stream_upload(file)
+    except _UploadTooLarge:
+        logging.warning(f"Upload abgelehnt (größer als {MAX_UPLOAD_MB:g} MB): {filename}")
+        return _too_large()
+    if size == 0:
+        tmp.unlink(missing_ok=True)
+        logging.error(f"Upload failed or empty file: {filename}")
+        return JSONResponse(status_code=400, content={"error": "Leere Datei."})
+
+    duplicate = await asyncio.to_thread(find_document_by_hash, sha256, size)
+    if duplicate is not None:
+        tmp.unlink(missing_ok=True)
+        doc_id, existing = duplicate
+        logging.info(f"Upload {filename} ist identisch mit {existing} – nichts zu tun.")
+        return {"filename": existing, "id": doc_id, "job_id": None, "status": "duplicate", "duplicate": True}
+
+    try:
+        stored = await asyncio.to_thread(_place_upload, tmp, filename, replace)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    doc_id = await asyncio.to_thread(add_document, stored, sha256=sha256, size=size)
+    logging.info(f"Uploaded file saved at: {UPLOAD_DIR / stored} ({size} Bytes, sha256 {sha256[:12]})")
+    # Indizierung läuft im Hintergrund (Uploads kurz hintereinander ergeben ein Index-Update);
+    # Fortschritt unter GET /jobs/{job_id}, bis dahin antwortet der Chat aus dem bisherigen Index
+    job = ingest_queue.submit("update", filename=stored, doc_id=doc_id)
+    return {"filename": stored, "id": doc_id, "job_id": job.id, "status": job.status, "duplicate": False}
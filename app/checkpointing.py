@@ -0,0 +1,203 @@
+from __future__ import annotations
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver  # type: ignore
+except Exception:
+    SqliteSaver = None  # type: ignore
+
+try:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver  # type: ignore
+except Exception:
+    AsyncSqliteSaver = None  # type: ignore
+
+from app.paths import resolve_project_path
+
+# Anzahl der Checkpoints, die pro Thread behalten werden (0 = unbegrenzt)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+# Nach wie vielen gespeicherten Checkpoints eines Threads aufgeräumt wird
+CHECKPOINT_PRUNE_EVERY = int(os.getenv("CHECKPOINT_PRUNE_EVERY", "10"))
+
+
+def _backend() -> str:
+    return os.getenv("CHECKPOINTER_BACKEND", "memory").lower()
+
+
+def _sqlite_path() -> str:
+    path = resolve_project_path(os.getenv("SQLITE_PATH", "data/checkpoints/langgraph.sqlite"))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+)
+
+_PRUNE_SQL = (
+    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN ("
+    " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC LIMIT ?)",
+    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN ("
+    " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?)",
+)
+
+
+def _thread_id(config: Dict[str, Any]) -> Optional[str]:
+    return (config.get("configurable") or {}).get("thread_id")
+
+
+class _PruneCounter:
+    """Counts puts per thread and signals every CHECKPOINT_PRUNE_EVERY-th one."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._puts: Dict[str, int] = defaultdict(int)
+
+    def due(self, thread_id: Optional[str]) -> bool:
+        if not thread_id or CHECKPOINT_KEEP_LAST <= 0:
+            return False
+        with self._lock:
+            self._puts[thread_id] += 1
+            return self._puts[thread_id] % max(1, CHECKPOINT_PRUNE_EVERY) == 0
+
+
+if SqliteSaver is not None:
+
+    class PruningSqliteSaver(SqliteSaver):  # type: ignore[misc, valid-type]
+        """SqliteSaver that keeps only the newest CHECKPOINT_KEEP_LAST checkpoints per thread.
+
+        The single connection is shared across threads (check_same_thread=False)
+        and serialized by the saver's lock; WAL lets readers proceed during writes.
+        """
+
+        def __init__(self, conn: sqlite3.Connection, **kwargs: Any) -> None:
+            super().__init__(conn, **kwargs)
+            self._prune_counter = _PruneCounter()
+
+        def put(self, config, checkpoint, metadata, new_versions):  # type: ignore[override]
+            out = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = _thread_id(config)
+            if self._prune_counter.due(thread_id):
+                self.prune(thread_id)  # type: ignore[arg-type]
+            return out
+
+        def prune(self, thread_id: str, keep_last: int = CHECKPOINT_KEEP_LAST) -> None:
+            with self.lock:
+                cur = self.conn.cursor()
+                cur.execute(_PRUNE_SQL[0], (thread_id, thread_id, keep_last))
+                cur.execute(_PRUNE_SQL[1], (thread_id, thread_id))
+                self.conn.commit()
+
+else:
+    PruningSqliteSaver = None  # type: ignore
+
+
+if AsyncSqliteSaver is not None:
+
+    class PruningAsyncSqliteSaver(AsyncSqliteSaver):  # type: ignore[misc, valid-type]
+        """Async counterpart of PruningSqliteSaver for graph.ainvoke/astream_events."""
+
+        def __init__(self, conn: Any, **kwargs: Any) -> None:
+            super().__init__(conn, **kwargs)
+            self._prune_counter = _PruneCounter()
+
+        async def aput(self, config, checkpoint, metadata, new_versions):  # type: ignore[override]
+            out = await super().aput(config, checkpoint, metadata, new_versions)
+            thread_id = _thread_id(config)
+            if self._prune_counter.due(thread_id):
+                await self.aprune(thread_id)  # type: ignore[arg-type]
+            return out
+
+        async def aprune(self, thread_id: str, keep_last: int = CHECKPOINT_KEEP_LAST) -> None:
+            async with self.lock:
+                await self.conn.execute(_PRUNE_SQL[0], (thread_id, thread_id, keep_last))
+                await self.conn.execute(_PRUNE_SQL[1], (thread_id, thread_id))
+                await self.conn.commit()
+
+else:
+    PruningAsyncSqliteSaver = None  # type: ignore
+
+
+class PruningMemorySaver(MemorySaver):
+    """In-memory saver with the same per-thread retention as the SQLite savers."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._prune_counter = _PruneCounter()
+        self._prune_lock = threading.Lock()
+
+    def put(self, config, checkpoint, metadata, new_versions):  # type: ignore[override]
+        out = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = _thread_id(config)
+        if self._prune_counter.due(thread_id):
+            self.prune(thread_id)  # type: ignore[arg-type]
+        return out
+
+    async def aput(self, config, checkpoint, metadata, new_versions):  # type: ignore[override]
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    def prune(self, thread_id: str, keep_last: int = CHECKPOINT_KEEP_LAST) -> None:
+        try:
+            with self._prune_lock:
+                for ns, checkpoints in self.storage.get(thread_id, {}).items():
+                    for checkpoint_id in sorted(checkpoints, reverse=True)[keep_last:]:
+                        checkpoints.pop(checkpoint_id, None)
+                        self.writes.pop((thread_id, ns, checkpoint_id), None)
+                    self._prune_blobs(thread_id, ns, checkpoints)
+        except Exception:
+            logging.debug("MemorySaver-Pruning übersprungen.", exc_info=True)
+
+    def _prune_blobs(self, thread_id: str, ns: str, checkpoints: Dict[str, Any]) -> None:
+        """Drop channel values no remaining checkpoint refers to."""
+        blobs = getattr(self, "blobs", None)
+        if not blobs:
+            return
+        referenced = set()
+        for serialized, _meta, _parent in checkpoints.values():
+            checkpoint = self.serde.loads_typed(serialized)
+            referenced.update(checkpoint.get("channel_versions", {}).items())
+        for key in [k for k in blobs if k[0] == thread_id and k[1] == ns and (k[2], k[3]) not in referenced]:
+            blobs.pop(key, None)
+
+
+_MEMORY_SAVER: Optional[PruningMemorySaver] = None
+_MEMORY_LOCK = threading.Lock()
+
+
+def _shared_memory_saver() -> PruningMemorySaver:
+    # sync and async graphs must see the same threads
+    global _MEMORY_SAVER
+    with _MEMORY_LOCK:
+        if _MEMORY_SAVER is None:
+            _MEMORY_SAVER = PruningMemorySaver()
+        return _MEMORY_SAVER
+
+
+def make_checkpointer():
+    if _backend() == "sqlite" and PruningSqliteSaver is not None:
+        conn = sqlite3.connect(_sqlite_path(), check_same_thread=False, timeout=30)
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        return PruningSqliteSaver(conn)
+    return _shared_memory_saver()
+
+
+async def make_async_checkpointer():
+    if _backend() == "sqlite":
+        if PruningAsyncSqliteSaver is not None:
+            import aiosqlite
+
+            conn = await aiosqlite.connect(_sqlite_path(), timeout=30)
+            for pragma in _PRAGMAS:
+                await conn.execute(pragma)
+            return PruningAsyncSqliteSaver(conn)
+        logging.warning("AsyncSqliteSaver nicht verfügbar (aiosqlite fehlt?) – async Graph nutzt MemorySaver.")
+    return _shared_memory_saver()
@@ -1,23 +1,24 @@
 from __future__ import annotations
+import asyncio
+import contextvars
 import os
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import Dict, Any, Literal, Callable
 from typing_extensions import TypedDict
 
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, BaseMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START, END, StateGraph
-from langgraph.graph.message import MessagesState
-from langgraph.checkpoint.memory import MemorySaver
-
-try:
-    from langgraph.checkpoint.sqlite import SqliteSaver  # type: ignore
-except Exception:
-    SqliteSaver = None  # type: ignore
 
+from app.models.llm import get_chat_model
+from app.checkpointing import make_async_checkpointer, make_checkpointer
 from app.schemas import AppState
 from app.agents.tools import get_toolset
-from app.agents.router import route_message
+from app.agents.router import aroute_message, route_message
+from app.agents.context import acompact_context, compact_context
 
 # Optional: map doc_id -> filename (for source filtering)
 try:
@@ -27,21 +28,12 @@ except Exception:
 
 
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o-mini")
-
-
-def _make_checkpointer():
-    backend = os.getenv("CHECKPOINTER_BACKEND", "memory").lower()
-    if backend == "sqlite" and SqliteSaver is not None:
-        path = os.getenv("SQLITE_PATH", "data/checkpoints/langgraph.sqlite")
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        import sqlite3
-        conn = sqlite3.connect(path)
-        return SqliteSaver(conn)
-    return MemorySaver()
-
-
-def _bind(llm: ChatOpenAI, tools):
-    return llm.bind_tools(tools)
+# Parallele Tool-Aufrufe einer Modellantwort: Threads je Anfrage und Timeout je Aufruf (ab Start des Aufrufs)
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+# Knoten ohne eingehende Kanten: Ziel von update_state für Antworten, die ohne Graph-Lauf
+# entstehen (Antwort-Cache); führt direkt zu END, damit keine Folge-Schritte anstehen
+RECORD_NODE = "record"
 
 
 def _should_call_tools(messages: list[BaseMessage]) -> bool:
@@ -53,71 +45,206 @@ def _should_call_tools(messages: list[BaseMessage]) -> bool:
     return False
 
 
-def _exec_toolcalls(tool_map: Dict[str, Callable[..., Any]], ai_msg: AIMessage, state: dict | None = None) -> list[ToolMessage]:
-    out: list[ToolMessage] = []
-    calls = ai_msg.tool_calls or ai_msg.additional_kwargs.get("tool_calls") or []
-    for c in calls:
-        name = c.get("name") or c.get("function", {}).get("name")
-        args = c.get("args") or c.get("function", {}).get("arguments") or {}
-        if isinstance(args, str):
-            try:
-                import json as _json
-                args = _json.loads(args)
-            except Exception:
-                args = {"input": args}
-
-        # Enforce per-document restriction when a doc context exists
-        if name in ("retrieve", "list_docs") and state is not None and isinstance(state, dict):
-            doc_label = state.get("doc") or state.get("document")
-            doc_id_val = state.get("doc_id")
-            try:
-                if not isinstance(args, dict):
-                    args = {}
-                if name == "retrieve":
-                    # prefer exact doc_id restriction
-                    if doc_id_val:
-                        args.setdefault("doc_id", doc_id_val)
-                        logging.debug(f"tool_call retrieve enforced doc_id={doc_id_val}")
-                    # and add filename filter for extra safety
-                    if doc_label:
-                        src = _get_doc_filename(doc_label) if callable(_get_doc_filename) else None
-                        if not src and isinstance(doc_label, str) and doc_label.lower().endswith(".pdf"):
-                            src = doc_label
-                        if src:
-                            args.setdefault("source", src)
-                            args.setdefault("source_exact", True)
-                            logging.debug(f"tool_call retrieve enforced source={src} label={doc_label}")
-                elif name == "list_docs" and doc_label:
+def _prepare_call(c: dict, state: dict | None) -> tuple[str, Any, str]:
+    """Parse one tool call and apply the per-document restriction; returns (name, args, call id)."""
+    name = c.get("name") or c.get("function", {}).get("name")
+    args = c.get("args") or c.get("function", {}).get("arguments") or {}
+    if isinstance(args, str):
+        try:
+            import json as _json
+            args = _json.loads(args)
+        except Exception:
+            args = {"input": args}
+
+    # Enforce per-document restriction when a doc context exists
+    if name in ("retrieve", "list_docs") and state is not None and isinstance(state, dict):
+        doc_label = state.get("doc") or state.get("document")
+        doc_id_val = state.get("doc_id")
+        try:
+            if not isinstance(args, dict):
+                args = {}
+            if name == "retrieve":
+                # prefer exact doc_id restriction
+                if doc_id_val:
+                    args.setdefault("doc_id", doc_id_val)
+                    logging.debug(f"tool_call retrieve enforced doc_id={doc_id_val}")
+                # and add filename filter for extra safety
+                if doc_label:
                     src = _get_doc_filename(doc_label) if callable(_get_doc_filename) else None
                     if not src and isinstance(doc_label, str) and doc_label.lower().endswith(".pdf"):
                         src = doc_label
                     if src:
-                        import os as _os
-                        args.setdefault("filter", _os.path.basename(str(src)))
-                        logging.debug(f"tool_call list_docs enforced filter for {src}")
-            except Exception:
-                pass
-
-        fn = tool_map.get(name)
-        if fn is None:
-            result = f"Tool '{name}' nicht gefunden."
-        else:
-            try:
-                result = fn.invoke(args) if hasattr(fn, "invoke") else fn(**args)
-            except TypeError:
-                result = fn.invoke({"query": args}) if hasattr(fn, "invoke") else fn(args)
-            except Exception as e:
-                result = f"Toolfehler: {e}"
-        out.append(ToolMessage(content=str(result), tool_call_id=c.get("id", "toolcall")))
+                        args.setdefault("source", src)
+                        args.setdefault("source_exact", True)
+                        logging.debug(f"tool_call retrieve enforced source={src} label={doc_label}")
+            elif name == "list_docs" and doc_label:
+                src = _get_doc_filename(doc_label) if callable(_get_doc_filename) else None
+                if not src and isinstance(doc_label, str) and doc_label.lower().endswith(".pdf"):
+                    src = doc_label
+                if src:
+                    import os as _os
+                    args.setdefault("filter", _os.path.basename(str(src)))
+                    logging.debug(f"tool_call list_docs enforced filter for {src}")
+        except Exception:
+            pass
+
+    return name, args, c.get("id", "toolcall")
+
+
+def _run_tool(tool_map: Dict[str, Callable[..., Any]], name: str, args: Any) -> str:
+    fn = tool_map.get(name)
+    if fn is None:
+        return f"Tool '{name}' nicht gefunden."
+    try:
+        result = fn.invoke(args) if hasattr(fn, "invoke") else fn(**args)
+    except TypeError:
+        result = fn.invoke({"query": args}) if hasattr(fn, "invoke") else fn(args)
+    except Exception as e:
+        result = f"Toolfehler: {e}"
+    return str(result)
+
+
+async def _arun_tool(tool_map: Dict[str, Callable[..., Any]], name: str, args: Any) -> str:
+    fn = tool_map.get(name)
+    if fn is None or not hasattr(fn, "ainvoke"):
+        return await asyncio.to_thread(_run_tool, tool_map, name, args)
+    try:
+        result = await fn.ainvoke(args)
+    except TypeError:
+        result = await fn.ainvoke({"query": args})
+    except Exception as e:
+        result = f"Toolfehler: {e}"
+    return str(result)
+
+
+class _ToolStats:
+    """Per-tool call counts and latencies (exposed via /stats)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.tools: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, seconds: float, *, error: bool = False, timeout: bool = False) -> None:
+        with self.lock:
+            entry = self.tools.setdefault(
+                name, {"calls": 0, "errors": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["timeouts"] += int(timeout)
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            out = {k: dict(v) for k, v in self.tools.items()}
+        for entry in out.values():
+            entry["avg_seconds"] = round(entry["total_seconds"] / entry["calls"], 4) if entry["calls"] else None
+            entry["total_seconds"] = round(entry["total_seconds"], 4)
+            entry["max_seconds"] = round(entry["max_seconds"], 4)
+        return out
+
+
+_TOOL_STATS = _ToolStats()
+
+
+def tool_stats() -> Dict[str, Dict[str, Any]]:
+    return _TOOL_STATS.snapshot()
+
+
+def _timed(tool_map: Dict[str, Callable[..., Any]], name: str, args: Any) -> str:
+    t0 = time.perf_counter()
+    result = _run_tool(tool_map, name, args)
+    _TOOL_STATS.record(name, time.perf_counter() - t0, error=result.startswith("Toolfehler"))
+    return result
+
+
+def _timeout_message(name: str) -> str:
+    return f"Toolfehler: '{name}' hat nach {TOOL_TIMEOUT_SECONDS:g}s nicht geantwortet."
+
+
+async def _atimed(tool_map: Dict[str, Callable[..., Any]], name: str, args: Any) -> str:
+    t0 = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(_arun_tool(tool_map, name, args), TOOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _TOOL_STATS.record(name, TOOL_TIMEOUT_SECONDS, timeout=True)
+        return _timeout_message(name)
+    _TOOL_STATS.record(name, time.perf_counter() - t0, error=result.startswith("Toolfehler"))
+    return result
+
+
+def _run_with_timeouts(tool_map: Dict[str, Callable[..., Any]], calls: list[tuple[str, Any]]) -> list[str]:
+    """Run sync tool calls concurrently on threads of this request; results keep the call order.
+
+    At most TOOL_MAX_WORKERS calls run at once, with the caller's contextvars
+    (callbacks/tracing). TOOL_TIMEOUT_SECONDS counts from when a call starts
+    running, so queued calls are not charged for waiting. A timed-out call
+    yields an error message; its thread finishes in the background and is not
+    reused, so calls queued behind only stuck threads are given up as well.
+    """
+    if not calls:
+        return []
+    workers = min(len(calls), max(1, TOOL_MAX_WORKERS))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+    started: list[float | None] = [None] * len(calls)
+
+    def run(i: int, name: str, args: Any) -> str:
+        started[i] = time.monotonic()
+        return _timed(tool_map, name, args)
+
+    futures = [pool.submit(contextvars.copy_context().run, run, i, name, args) for i, (name, args) in enumerate(calls)]
+    stuck: list[Future] = []
+    out: list[str] = []
+    try:
+        for i, ((name, _), fut) in enumerate(zip(calls, futures)):
+            result: str | None = None
+            while result is None:
+                t0 = started[i]
+                if t0 is None and sum(1 for f in stuck if not f.done()) >= workers:
+                    # every thread is held by a timed-out call: this one would never start
+                    fut.cancel()
+                    _TOOL_STATS.record(name, 0.0, timeout=True)
+                    result = _timeout_message(name)
+                    continue
+                # not started yet: wait briefly and check again, otherwise until its own deadline
+                wait = 0.05 if t0 is None else max(0.0, t0 + TOOL_TIMEOUT_SECONDS - time.monotonic())
+                try:
+                    result = fut.result(timeout=wait)
+                except FutureTimeout:
+                    if t0 is not None:
+                        stuck.append(fut)
+                        _TOOL_STATS.record(name, TOOL_TIMEOUT_SECONDS, timeout=True)
+                        result = _timeout_message(name)
+            out.append(result)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
     return out
 
 
+def _exec_toolcalls(tool_map: Dict[str, Callable[..., Any]], ai_msg: AIMessage, state: dict | None = None) -> list[ToolMessage]:
+    """Run the tool calls of one AIMessage concurrently, each bounded by TOOL_TIMEOUT_SECONDS."""
+    calls = ai_msg.tool_calls or ai_msg.additional_kwargs.get("tool_calls") or []
+    prepared = [_prepare_call(c, state) for c in calls]
+    results = _run_with_timeouts(tool_map, [(name, args) for name, args, _ in prepared])
+    return [ToolMessage(content=r, tool_call_id=call_id) for r, (_, _, call_id) in zip(results, prepared)]
+
+
+async def _aexec_toolcalls(
+    tool_map: Dict[str, Callable[..., Any]], ai_msg: AIMessage, state: dict | None = None
+) -> list[ToolMessage]:
+    """Async variant of _exec_toolcalls: all calls via ainvoke under asyncio.gather."""
+    calls = ai_msg.tool_calls or ai_msg.additional_kwargs.get("tool_calls") or []
+    prepared = [_prepare_call(c, state) for c in calls]
+    results = await asyncio.gather(*(_atimed(tool_map, name, args) for name, args, _ in prepared))
+    return [ToolMessage(content=r, tool_call_id=call_id) for r, (_, _, call_id) in zip(results, prepared)]
+
+
 def _mk_assistant(system_prompt: str, tools_enabled: bool):
-    base = ChatOpenAI(model=MODEL_NAME, temperature=0.2)
     tools, tool_map = get_toolset(include_web=None)
-    llm = _bind(base, tools) if tools_enabled else base
+    llm = get_chat_model(model=MODEL_NAME, temperature=0.2, tools=tools if tools_enabled else None)
 
-    def node(state: AppState) -> dict:
+    def _prepare(state: AppState) -> list:
         messages = state.get("messages", [])
 
         # sanitize unresolved tool call messages
@@ -149,76 +276,108 @@ def _mk_assistant(system_prompt: str, tools_enabled: bool):
 
         extra_sys = state.get("system") if isinstance(state, dict) else None
         sys_content = system_prompt if not extra_sys else f"{system_prompt}\n\n{extra_sys}"
-        msgs = [{"role": "system", "content": sys_content}] + [m for m in cleaned]
-        ai = llm.invoke(msgs)
+        summary = state.get("summary") if isinstance(state, dict) else None
+        if summary:
+            sys_content += f"\n\nSummary of the earlier conversation:\n{summary}"
+        return [{"role": "system", "content": sys_content}] + [m for m in cleaned]
+
+    def node(state: AppState) -> dict:
+        ai = llm.invoke(_prepare(state))
         return {"messages": [ai]}
 
-    def call_tools(state: AppState) -> dict:
+    async def anode(state: AppState) -> dict:
+        ai = await llm.ainvoke(_prepare(state))
+        return {"messages": [ai]}
+
+    def _pending_calls(state: AppState) -> AIMessage | None:
         messages = state.get("messages", [])
-        if not messages:
-            return {"messages": []}
-        last = messages[-1]
+        last = messages[-1] if messages else None
         if isinstance(last, AIMessage) and (last.tool_calls or last.additional_kwargs.get("tool_calls")):
-            tool_messages = _exec_toolcalls(tool_map, last, state)  # type: ignore
-            return {"messages": tool_messages}
+            return last
+        return None
 
+    def _auto_retrieve_args(state: AppState) -> Dict[str, Any] | None:
         # Fallback: enforce a retrieve call in doc context
         doc_label = None
         doc_id_val = None
         if isinstance(state, dict):
             doc_label = state.get("doc") or state.get("document")
             doc_id_val = state.get("doc_id")
-        if doc_label or doc_id_val:
-            user_text = ""
-            for m in reversed(messages):
-                if isinstance(m, HumanMessage):
-                    user_text = m.content  # type: ignore
-                    break
-            args: Dict[str, Any] = {"query": user_text}
-            if doc_id_val:
-                args["doc_id"] = doc_id_val
-            else:
-                try:
-                    src = _get_doc_filename(doc_label) if callable(_get_doc_filename) else None
-                    if not src and isinstance(doc_label, str) and doc_label.lower().endswith(".pdf"):
-                        src = doc_label
-                    if src:
-                        args["source"] = src
-                        args["source_exact"] = True
-                except Exception:
-                    pass
+        if not (doc_label or doc_id_val):
+            return None
+        user_text = ""
+        for m in reversed(state.get("messages", [])):
+            if isinstance(m, HumanMessage):
+                user_text = m.content  # type: ignore
+                break
+        args: Dict[str, Any] = {"query": user_text}
+        if doc_id_val:
+            args["doc_id"] = doc_id_val
+        else:
             try:
-                retrieve = tool_map.get("retrieve")
-                result = retrieve.invoke(args) if hasattr(retrieve, "invoke") else retrieve(**args)  # type: ignore
-                return {"messages": [ToolMessage(content=str(result), tool_call_id="auto-retrieve")]}
-            except Exception as e:  # type: ignore
-                return {"messages": [ToolMessage(content=f"Toolfehler: {e}", tool_call_id="auto-retrieve")]}
-        return {"messages": []}
+                src = _get_doc_filename(doc_label) if callable(_get_doc_filename) else None
+                if not src and isinstance(doc_label, str) and doc_label.lower().endswith(".pdf"):
+                    src = doc_label
+                if src:
+                    args["source"] = src
+                    args["source_exact"] = True
+            except Exception:
+                pass
+        return args
+
+    def call_tools(state: AppState) -> dict:
+        if not state.get("messages"):
+            return {"messages": []}
+        last = _pending_calls(state)
+        if last is not None:
+            return {"messages": _exec_toolcalls(tool_map, last, state)}  # type: ignore
+        args = _auto_retrieve_args(state)
+        if args is None:
+            return {"messages": []}
+        result = _run_with_timeouts(tool_map, [("retrieve", args)])[0]
+        return {"messages": [ToolMessage(content=result, tool_call_id="auto-retrieve")]}
+
+    async def acall_tools(state: AppState) -> dict:
+        if not state.get("messages"):
+            return {"messages": []}
+        last = _pending_calls(state)
+        if last is not None:
+            return {"messages": await _aexec_toolcalls(tool_map, last, state)}  # type: ignore
+        args = _auto_retrieve_args(state)
+        if args is None:
+            return {"messages": []}
+        result = await _atimed(tool_map, "retrieve", args)
+        return {"messages": [ToolMessage(content=result, tool_call_id="auto-retrieve")]}
 
     def after(state: AppState) -> Literal["tools", "__end__"]:
         # Doc-Modus: Erst Tools erzwingen, dann nach einer ToolMessage genau eine AI-Antwort und beenden.
         if isinstance(state, dict) and (state.get("doc") or state.get("document") or state.get("doc_id")):
             msgs = state.get("messages", []) if isinstance(state, dict) else []
-            # Wenn schon mindestens eine ToolMessage in der Historie vorkommt, beenden (die AI-Antwort danach ist final)
-            if any(isinstance(m, ToolMessage) for m in msgs):
+            # nur die aktuelle Runde (ab der letzten Nutzerfrage) betrachten
+            last_human = max((i for i, m in enumerate(msgs) if isinstance(m, HumanMessage)), default=-1)
+            # Wenn in dieser Runde schon eine ToolMessage vorkommt, beenden (die AI-Antwort danach ist final)
+            if any(isinstance(m, ToolMessage) for m in msgs[last_human + 1:]):
                 return "__end__"
             return "tools"
         # Global/ohne Doc: nur auf explizite Tool-Calls reagieren
         return "tools" if _should_call_tools(state.get("messages", [])) else "__end__"
 
-    return node, call_tools, after
+    # sync + native async implementation (graph.invoke / graph.astream_events)
+    return RunnableLambda(node, afunc=anode), RunnableLambda(call_tools, afunc=acall_tools), after
 
 
-def build_graph():
-    def router(state: AppState) -> dict:
+def build_graph(checkpointer=None):
+    def _forced_route(state: AppState) -> str | None:
         # force RAG for global or doc context
         if isinstance(state, dict):
             if state.get("global_rag"):
-                return {"route": "rag"}
+                return "rag"
             doc_ctx = state.get("doc") or state.get("document")
             if doc_ctx:
-                return {"route": "rag"}
+                return "rag"
+        return None
 
+    def _last_user_text(state: AppState) -> str:
         user_text = ""
         for msg in reversed(state.get("messages", [])):
             if hasattr(msg, "type") and getattr(msg, "type") == "human":
@@ -227,9 +386,24 @@ def build_graph():
             if isinstance(msg, dict) and msg.get("role") == "user":
                 user_text = msg.get("content", "")
                 break
-        decision = route_message(user_text)
+        return user_text
+
+    def router_sync(state: AppState) -> dict:
+        forced = _forced_route(state)
+        if forced:
+            return {"route": forced}
+        decision = route_message(_last_user_text(state))
         return {"route": decision.route}
 
+    async def router_async(state: AppState) -> dict:
+        forced = _forced_route(state)
+        if forced:
+            return {"route": forced}
+        decision = await aroute_message(_last_user_text(state))
+        return {"route": decision.route}
+
+    router = RunnableLambda(router_sync, afunc=router_async)
+
     direct_node, direct_tools, direct_after = _mk_assistant(
         system_prompt=(
             "You are a helpful assistant. Answer directly and concisely. "
@@ -257,7 +431,8 @@ def build_graph():
         tools_enabled=True,
     )
 
-    graph = StateGraph(MessagesState)
+    graph = StateGraph(AppState)
+    graph.add_node("context", RunnableLambda(compact_context, afunc=acompact_context))
     graph.add_node("router", router)
 
     graph.add_node("direct", direct_node)
@@ -267,7 +442,11 @@ def build_graph():
     graph.add_node("web", web_node)
     graph.add_node("web_tools", web_tools)
 
-    graph.add_edge(START, "router")
+    graph.add_node(RECORD_NODE, RunnableLambda(lambda state: {}))
+    graph.add_edge(RECORD_NODE, END)
+
+    graph.add_edge(START, "context")
+    graph.add_edge("context", "router")
 
     def route_edge(state: AppState) -> Literal["direct", "rag", "web", "__end__"]:
         route = state.get("route") or "direct"
@@ -286,9 +465,49 @@ def build_graph():
     graph.add_conditional_edges("web", web_after, {"tools": "web_tools", "__end__": END})
     graph.add_edge("web_tools", "web")
 
-    checkpointer = _make_checkpointer()
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
     return graph.compile(checkpointer=checkpointer)
 
 
 def get_graph():
     return build_graph()
+
+
+def _turn(state: dict, answer: str) -> dict:
+    return {**state, "messages": list(state.get("messages", [])) + [AIMessage(content=answer)]}
+
+
+def record_turn(graph, config: dict, state: dict, answer: str) -> None:
+    """Append a turn answered outside the graph (question and answer) to the thread."""
+    graph.update_state(config, _turn(state, answer), as_node=RECORD_NODE)
+
+
+async def arecord_turn(graph, config: dict, state: dict, answer: str) -> None:
+    await graph.aupdate_state(config, _turn(state, answer), as_node=RECORD_NODE)
+
+
+def has_history(graph, config: dict) -> bool:
+    """True if the thread already holds messages (answers may then depend on earlier turns)."""
+    return bool(graph.get_state(config).values.get("messages"))
+
+
+async def ahas_history(graph, config: dict) -> bool:
+    return bool((await graph.aget_state(config)).values.get("messages"))
+
+
+_ASYNC_GRAPH = None
+_ASYNC_GRAPH_LOCK: asyncio.Lock | None = None
+
+
+async def aget_graph():
+    """Graph for ainvoke/astream_events, backed by the async checkpointer (built once)."""
+    global _ASYNC_GRAPH, _ASYNC_GRAPH_LOCK
+    if _ASYNC_GRAPH is not None:
+        return _ASYNC_GRAPH
+    if _ASYNC_GRAPH_LOCK is None:
+        _ASYNC_GRAPH_LOCK = asyncio.Lock()
+    async with _ASYNC_GRAPH_LOCK:
+        if _ASYNC_GRAPH is None:
+            _ASYNC_GRAPH = build_graph(checkpointer=await make_async_checkpointer())
+    return _ASYNC_GRAPH
@@ -1,17 +1,153 @@
 from __future__ import annotations
 import os
-from typing import Optional, Sequence
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+import httpx
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
 
+# Gemeinsamer HTTP-Connection-Pool für alle Chat-Modelle (Keep-Alive, TLS-Session-Reuse)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
 class LLMConfig(BaseModel):
     model: str = os.getenv("MODEL_NAME", "gpt-4o-mini")
     temperature: float = 0.2
     streaming: bool = False
 
-def get_chat_model(cfg: Optional[LLMConfig] = None) -> ChatOpenAI:
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _pool_stats(client: Optional[Any]) -> Optional[Dict[str, int]]:
+    """Open/idle connections of an httpx client (httpcore internals, best effort)."""
+    if client is None:
+        return None
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", None) or [])
+    try:
+        idle = sum(1 for c in conns if c.is_idle())
+    except Exception:
+        idle = -1
+    return {"connections": len(conns), "idle": idle}
+
+
+class ModelRegistry:
+    """Process-wide chat models keyed by (model, temperature, binding).
+
+    All models share one sync and one async httpx client, so requests reuse
+    pooled keep-alive connections instead of opening a new TCP/TLS session per
+    ChatOpenAI instance. The async client belongs to the event loop of the
+    server (uvicorn runs a single loop per worker).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[Hashable, ...], Any] = {}
+        self._http: Optional[httpx.Client] = None
+        self._ahttp: Optional[httpx.AsyncClient] = None
+        self._counters = {"created": 0, "hits": 0}
+        self._factory: Optional[Callable[[str, float], Any]] = None
+
+    def _clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        if self._http is None:
+            timeout = httpx.Timeout(LLM_TIMEOUT, connect=10.0)
+            self._http = httpx.Client(limits=_limits(), timeout=timeout)
+            self._ahttp = httpx.AsyncClient(limits=_limits(), timeout=timeout)
+        return self._http, self._ahttp  # type: ignore[return-value]
+
+    def _base(self, model: str, temperature: float) -> ChatOpenAI:
+        key = ("base", model, temperature)
+        llm = self._models.get(key)
+        if llm is None:
+            if self._factory is not None:
+                llm = self._factory(model, temperature)
+            else:
+                http, ahttp = self._clients()
+                llm = ChatOpenAI(model=model, temperature=temperature, http_client=http, http_async_client=ahttp)
+            self._models[key] = llm
+            self._counters["created"] += 1
+        return llm
+
+    def get(self, model: str, temperature: float, *, tools: Optional[Sequence[Any]] = None, schema: Optional[type] = None):
+        binding: Hashable = None
+        if tools:
+            binding = ("tools",) + tuple(getattr(t, "name", str(t)) for t in tools)
+        elif schema is not None:
+            binding = ("schema", f"{schema.__module__}.{schema.__qualname__}")
+        key = ("bound", model, temperature, binding)
+        with self._lock:
+            runnable = self._models.get(key)
+            if runnable is not None:
+                self._counters["hits"] += 1
+                return runnable
+            base = self._base(model, temperature)
+            if tools:
+                runnable = base.bind_tools(list(tools))
+            elif schema is not None:
+                runnable = base.with_structured_output(schema)
+            else:
+                runnable = base
+            self._models[key] = runnable
+            return runnable
+
+    def use_factory(self, factory: Optional[Callable[[str, float], Any]]) -> None:
+        """Build base models with ``factory(model, temperature)`` instead of ChatOpenAI (None restores it)."""
+        with self._lock:
+            self._factory = factory
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["models"] = sorted(
+                f"{k[1]}@{k[2]}" + (f" {k[3][0]}" if k[3] else "") for k in self._models if k[0] == "bound"
+            )
+        out["limits"] = {
+            "max_connections": LLM_MAX_CONNECTIONS,
+            "max_keepalive": LLM_MAX_KEEPALIVE,
+            "keepalive_expiry": LLM_KEEPALIVE_EXPIRY,
+        }
+        out["pool"] = {"sync": _pool_stats(self._http), "async": _pool_stats(self._ahttp)}
+        return out
+
+
+_REGISTRY = ModelRegistry()
+
+
+def get_chat_model(
+    cfg: Optional[LLMConfig] = None,
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    tools: Optional[Sequence[Any]] = None,
+):
+    """Shared chat model; with ``tools`` the cached ``bind_tools`` runnable."""
     cfg = cfg or LLMConfig()
     # Hinweis: output_version / responses API wird automatisch gewählt,
     # LangChain kapselt die Parameter.
-    llm = ChatOpenAI(model=cfg.model, temperature=cfg.temperature)
-    return llm
+    return _REGISTRY.get(model or cfg.model, cfg.temperature if temperature is None else temperature, tools=tools)
+
+
+def get_structured_model(schema: type, *, model: str, temperature: float = 0.0):
+    """Shared ``with_structured_output(schema)`` runnable."""
+    return _REGISTRY.get(model, temperature, schema=schema)
+
+
+def set_model_factory(factory: Optional[Callable[[str, float], Any]]) -> None:
+    """Replace the chat model backend, e.g. with a fake model for offline benchmarks.
+
+    Graphs bind their models when they are built, so call this before ``get_graph()``.
+    """
+    _REGISTRY.use_factory(factory)
+
+
+def llm_stats() -> Dict[str, Any]:
+    return _REGISTRY.stats()
@@ -10,3 +10,12 @@ class AppState(TypedDict, total=False):
     route: Optional[Literal["direct", "rag", "web", "clarify"]]
     # Zitationsliste (für RAG/Web-Agent)
     citations: List[Dict[str, Any]]
+    # Dokument-Kontext aus /chat (Label, Dateiname, ID) und zusätzlicher System-Prompt
+    doc: Optional[str]
+    document: Optional[str]
+    doc_id: Optional[str]
+    system: Optional[str]
+    # Globaler Dokumenten-Chat: RAG über alle Dokumente erzwingen
+    global_rag: Optional[bool]
+    # Laufende Zusammenfassung älterer, aus der Historie entfernter Runden
+    summary: Optional[str]
@@ -0,0 +1,264 @@
+from __future__ import annotations
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Latenz-Buckets in Sekunden (Prometheus-Histogramme)
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels: Any) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in items)
+    return "{" + body + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = _BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series[idx] += 1  # values above the last bound only count towards +Inf
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_fmt_labels(labels, ('le', f'{bound:g}'))} {cumulative:g}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {series[-1]:g}")
+            lines.append(f"{self.name}_sum{_fmt_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_fmt_labels(labels)} {series[-1]:g}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_fmt_labels(k)} {v:g}" for k, v in items)
+        return lines
+
+
+SPAN_SECONDS = Histogram("app_span_seconds", "Duration of graph nodes, tools, LLM, embedding and retrieval calls.")
+HTTP_SECONDS = Histogram("app_http_request_seconds", "HTTP request latency.")
+LLM_TOKENS = Counter("app_llm_tokens_total", "LLM tokens by model and type (prompt/completion).")
+SPAN_ERRORS = Counter("app_span_errors_total", "Spans that ended with an exception.")
+QUERY_CACHE_LOOKUPS = Counter("app_query_embedding_cache_total", "Query embedding cache lookups by result (hit/miss).")
+
+
+class Trace:
+    """Spans of one request (for the optional timing breakdown in /chat)."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, kind: str, name: str, start: float, seconds: float, **extra: Any) -> None:
+        entry = {"kind": kind, "name": name, "start_ms": round((start - self.started) * 1000, 2), "ms": round(seconds * 1000, 2)}
+        entry.update({k: v for k, v in extra.items() if v is not None})
+        with self._lock:
+            self.spans.append(entry)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        by_kind: Dict[str, float] = {}
+        for s in spans:
+            by_kind[s["kind"]] = round(by_kind.get(s["kind"], 0.0) + s["ms"], 2)
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "by_kind_ms": by_kind,
+            "spans": spans,
+        }
+
+
+_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("app_trace", default=None)
+
+
+@contextmanager
+def request_trace() -> Iterator[Trace]:
+    trace = Trace()
+    token = _TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _TRACE.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+def record(kind: str, name: str, start: float, seconds: float, *, error: bool = False, **extra: Any) -> None:
+    SPAN_SECONDS.observe(seconds, kind=kind, name=name)
+    if error:
+        SPAN_ERRORS.inc(kind=kind, name=name)
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.add(kind, name, start, seconds, error=True if error else None, **extra)
+
+
+@contextmanager
+def span(kind: str, name: str, **extra: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block; ``extra`` (and keys added to the yielded dict) go into the request trace."""
+    start = time.perf_counter()
+    data: Dict[str, Any] = dict(extra)
+    error = False
+    try:
+        yield data
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(kind, name, start, time.perf_counter() - start, error=error, **data)
+
+
+def _token_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    if prompt is None:
+        for gens in getattr(response, "generations", None) or []:
+            for gen in gens:
+                meta = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                if meta:
+                    prompt = (prompt or 0) + int(meta.get("input_tokens", 0))
+                    completion = (completion or 0) + int(meta.get("output_tokens", 0))
+    return prompt, completion
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Records graph nodes, tools and LLM calls (incl. token counts) as spans.
+
+    Pass it via ``config={"callbacks": [handler]}``. Graph nodes are the chain
+    runs whose name equals their ``langgraph_node`` metadata.
+    """
+
+    run_inline = True  # keep the request's contextvars in async runs
+
+    def __init__(self, trace: Optional[Trace] = None) -> None:
+        self.trace = trace
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, Tuple[str, str, float, Dict[str, Any]]] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, **extra: Any) -> None:
+        with self._lock:
+            self._open[run_id] = (kind, name, time.perf_counter(), extra)
+
+    def _end(self, run_id: UUID, *, error: bool = False, **extra: Any) -> None:
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        kind, name, start, data = opened
+        seconds = time.perf_counter() - start
+        data.update(extra)
+        SPAN_SECONDS.observe(seconds, kind=kind, name=name)
+        if error:
+            SPAN_ERRORS.inc(kind=kind, name=name)
+        trace = self.trace or _TRACE.get()
+        if trace is not None:
+            trace.add(kind, name, start, seconds, error=True if error else None, **data)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        run_name = name or (serialized or {}).get("name")
+        if node and run_name == node:
+            self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, name=None, **kwargs) -> None:
+        self._start(run_id, "tool", name or (serialized or {}).get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def _llm_name(self, serialized, metadata, kwargs) -> str:
+        invocation = kwargs.get("invocation_params") or {}
+        return str(
+            invocation.get("model")
+            or invocation.get("model_name")
+            or (metadata or {}).get("ls_model_name")
+            or (serialized or {}).get("name")
+            or "llm"
+        )
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        self._start(run_id, "llm", self._llm_name(serialized, metadata, kwargs), node=node)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        self._start(run_id, "llm", self._llm_name(serialized, metadata, kwargs), node=node)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        prompt, completion = _token_usage(response)
+        with self._lock:
+            opened = self._open.get(run_id)
+        model = opened[1] if opened else "llm"
+        if prompt is not None:
+            LLM_TOKENS.inc(prompt, model=model, type="prompt")
+        if completion is not None:
+            LLM_TOKENS.inc(completion, model=model, type="completion")
+        self._end(run_id, prompt_tokens=prompt, completion_tokens=completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in (SPAN_SECONDS, SPAN_ERRORS, LLM_TOKENS, QUERY_CACHE_LOOKUPS, HTTP_SECONDS):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.filelock import file_lock
+from app.paths import resolve_project_path
+from app.vectorstore.embeddings import get_embeddings
+
+_KEY_BYTES = 32  # sha256 digest
+_MIN_CAPACITY = 1024
+
+
+def _env(key: str, default: str) -> str:
+    return os.getenv(key, default)
+
+
+class EmbeddingCache:
+    """Content-addressed, size-bounded on-disk store of embedding vectors.
+
+    One directory per (provider, model). Layout:
+    - ``vectors.f32``: float32 matrix (capacity x dim), memory-mapped
+    - ``keys.bin``:    sha256 digest per slot (capacity x 32 bytes), memory-mapped
+    - ``ticks.u64``:   last-access tick per slot, used for LRU eviction
+    - ``meta.json``:   dim, capacity, used slots, current tick, write counter
+
+    The digest -> slot dict is rebuilt lazily from ``keys.bin`` on first lookup,
+    so opening the cache only maps the files.
+
+    Several processes may share one directory (server workers, CLI ingest):
+    writes hold ``writer.lock`` and first adopt the current meta.json, readers
+    re-read meta.json when it changed, and every hit is checked against the
+    digest stored in its slot, so a slot reused by another process is a miss.
+    """
+
+    def __init__(self, directory: Path, *, max_entries: int = 500_000) -> None:
+        self.directory = directory
+        self.max_entries = max(_MIN_CAPACITY, max_entries)
+        self._lock = threading.Lock()
+        self._dim = 0
+        self._capacity = 0
+        self._count = 0
+        self._tick = 0
+        self._version = 0  # bumped by every write, so other processes notice reused slots
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._ticks: Optional[np.memmap] = None
+        self._slots: Optional[Dict[bytes, int]] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sync()
+
+    # ---- files -----------------------------------------------------------
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _meta_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self._path("meta.json").stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read_meta(self) -> Tuple[Tuple[int, int, int, int], int]:
+        with self._path("meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        state = (int(meta["dim"]), int(meta["capacity"]), int(meta["count"]), int(meta.get("version", 0)))
+        return state, int(meta.get("tick", 0))
+
+    def _sync(self) -> None:
+        """Adopt meta.json as written by any process: remap the files and drop the slot index if it changed."""
+        self._stamp = self._meta_stamp()
+        try:
+            state, tick = self._read_meta()
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            state, tick = (0, 0, 0, 0), 0
+        self._tick = max(self._tick, tick)
+        if state == (self._dim, self._capacity, self._count, self._version):
+            return
+        self._unmap()
+        self._dim, self._capacity, self._count, self._version = state
+        self._slots = None
+        if self._capacity:
+            try:
+                self._map()
+            except (OSError, ValueError):
+                logging.warning(f"Embedding-Cache unter {self.directory} unlesbar, wird neu angelegt.", exc_info=True)
+                self._unmap()
+                self._dim = self._capacity = self._count = 0
+
+    def _map(self) -> None:
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+", shape=(self._capacity, self._dim))
+        self._keys = np.memmap(self._path("keys.bin"), dtype=np.uint8, mode="r+", shape=(self._capacity, _KEY_BYTES))
+        self._ticks = np.memmap(self._path("ticks.u64"), dtype=np.uint64, mode="r+", shape=(self._capacity,))
+
+    def _unmap(self) -> None:
+        for arr in (self._vectors, self._keys, self._ticks):
+            if arr is not None:
+                arr.flush()
+        self._vectors = self._keys = self._ticks = None
+
+    def _resize(self, capacity: int) -> None:
+        self._unmap()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, row_bytes in (
+            ("vectors.f32", self._dim * 4),
+            ("keys.bin", _KEY_BYTES),
+            ("ticks.u64", 8),
+        ):
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._capacity = capacity
+        self._map()
+
+    def _write_meta(self) -> None:
+        self._version += 1
+        tmp = self._path("meta.json.tmp")
+        meta = {
+            "dim": self._dim,
+            "capacity": self._capacity,
+            "count": self._count,
+            "tick": self._tick,
+            "version": self._version,
+        }
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("meta.json"))
+        self._stamp = self._meta_stamp()
+
+    def _reset(self, dim: int) -> None:
+        self._unmap()
+        for name in ("vectors.f32", "keys.bin", "ticks.u64", "meta.json"):
+            try:
+                self._path(name).unlink()
+            except FileNotFoundError:
+                pass
+        self._dim, self._capacity, self._count = dim, 0, 0
+        self._slots = {}
+
+    def _slot_index(self) -> Dict[bytes, int]:
+        if self._slots is None:
+            raw = self._keys[: self._count].tobytes() if self._count else b""
+            self._slots = {raw[i * _KEY_BYTES : (i + 1) * _KEY_BYTES]: i for i in range(self._count)}
+        return self._slots
+
+    # ---- public API --------------------------------------------------------
+    def get_many(self, digests: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            if self._meta_stamp() != self._stamp:
+                self._sync()
+            if not self._count:
+                self.misses += len(digests)
+                return [None] * len(digests)
+            slots = self._slot_index()
+            self._tick += 1
+            out: List[Optional[np.ndarray]] = []
+            for dg in digests:
+                slot = slots.get(dg)
+                vec = None
+                if slot is not None and slot < self._capacity and bytes(self._keys[slot]) == dg:
+                    vec = np.array(self._vectors[slot])
+                    # writers clear the key before replacing the vector: re-check after the copy
+                    if bytes(self._keys[slot]) != dg:
+                        vec = None
+                if vec is None:
+                    if slot is not None and slots.get(dg) == slot:
+                        del slots[dg]  # slot was reused by another process
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self.hits += 1
+                self._ticks[slot] = self._tick
+                out.append(vec)
+            return out
+
+    def put_many(self, digests: Sequence[bytes], vectors: Sequence[Sequence[float]]) -> None:
+        if not digests:
+            return
+        mat = np.asarray(vectors, dtype=np.float32)
+        with file_lock(self.directory / "writer.lock"), self._lock:
+            # another process may have added, evicted or reset slots since our last look
+            self._sync()
+            if self._dim != mat.shape[1]:
+                self._reset(int(mat.shape[1]))
+            slots = self._slot_index()
+            first: Dict[bytes, int] = {}
+            for i, dg in enumerate(digests):
+                first.setdefault(dg, i)
+            fresh = [dg for dg in first if dg not in slots]
+            if not fresh:
+                return
+            self._tick += 1
+            targets = self._allocate(len(fresh))
+            for dg, slot in zip(fresh, targets):
+                old = bytes(self._keys[slot])
+                if slot < self._count and slots.get(old) == slot:
+                    del slots[old]
+                # clear the key first, so concurrent readers never pair the old key with the new vector
+                self._keys[slot] = 0
+                self._vectors[slot] = mat[first[dg]]
+                self._keys[slot] = np.frombuffer(dg, dtype=np.uint8)
+                self._ticks[slot] = self._tick
+                slots[dg] = slot
+            self._count = max(self._count, max(targets) + 1)
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+            self._write_meta()
+
+    def _allocate(self, n: int) -> List[int]:
+        n = min(n, self.max_entries)
+        free = self._capacity - self._count
+        if free < n and self._capacity < self.max_entries:
+            needed = self._count + n
+            capacity = max(_MIN_CAPACITY, self._capacity)
+            while capacity < needed and capacity < self.max_entries:
+                capacity *= 2
+            self._resize(min(capacity, self.max_entries))
+            free = self._capacity - self._count
+        targets = list(range(self._count, self._count + min(free, n)))
+        missing = n - len(targets)
+        if missing > 0:
+            # evict least recently used slots (ticks from this batch are the newest)
+            victims = np.argpartition(self._ticks[: self._count], missing - 1)[:missing]
+            targets.extend(int(v) for v in victims)
+            self.evictions += missing
+        return targets
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "entries": self._count,
+            "capacity": self._capacity,
+            "max_entries": self.max_entries,
+            "dimension": self._dim,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves unchanged chunk texts from an EmbeddingCache."""
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache) -> None:
+        self.inner = inner
+        self.cache = cache
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [self._digest(t) for t in texts]
+        cached = self.cache.get_many(digests)
+        todo: Dict[bytes, str] = {}
+        for dg, text, vec in zip(digests, texts, cached):
+            if vec is None:
+                todo.setdefault(dg, text)
+        fresh: Dict[bytes, List[float]] = {}
+        if todo:
+            vectors = self.inner.embed_documents(list(todo.values()))
+            fresh = dict(zip(todo.keys(), vectors))
+            self.cache.put_many(list(fresh.keys()), list(fresh.values()))
+        return [vec.tolist() if vec is not None else list(fresh[dg]) for dg, vec in zip(digests, cached)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.inner.aembed_query(text)
+
+
+_CACHED: Dict[Tuple[str, str], CachedEmbeddings] = {}
+_CACHED_LOCK = threading.Lock()
+
+
+def _cache_dir(provider: str, model: str) -> Path:
+    base = resolve_project_path(_env("EMBEDDING_CACHE_DIR", "data/index/embedding_cache"))
+    return base / re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{provider}__{model}")
+
+
+def get_cached_embeddings(*, provider: str, model: str) -> CachedEmbeddings:
+    """Process-wide cached wrapper around get_embeddings() for (provider, model)."""
+    key = (provider.lower(), model)
+    with _CACHED_LOCK:
+        emb = _CACHED.get(key)
+        if emb is None:
+            cache = EmbeddingCache(
+                _cache_dir(*key),
+                max_entries=int(_env("EMBEDDING_CACHE_MAX_ENTRIES", "500000")),
+            )
+            emb = CachedEmbeddings(get_embeddings(provider=provider, model=model), cache)
+            _CACHED[key] = emb
+    return emb
+
+
+def embedding_cache_stats() -> List[Dict[str, Any]]:
+    return [emb.cache.stats() for emb in list(_CACHED.values())]
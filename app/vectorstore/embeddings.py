@@ -1,19 +1,35 @@
 from __future__ import annotations
 
-from typing import List, Sequence
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
 
 from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from app.telemetry import span
+
 
 class SimpleOpenAIEmbeddings(Embeddings):
-    """Lightweight OpenAI embedding wrapper that avoids tiktoken downloads."""
+    """Lightweight OpenAI embedding wrapper that avoids tiktoken downloads.
+
+    Inputs are packed into batches bounded by input count and an estimated
+    token budget, sent concurrently on a bounded pool and reassembled in input
+    order. Rate limits and transient errors are retried with exponential backoff.
+    """
 
     def __init__(
         self,
         *,
         model: str = "text-embedding-3-small",
-        batch_size: int = 16,
+        batch_size: int = 256,
+        max_batch_tokens: int = 100_000,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
     ) -> None:
         try:
             from openai import OpenAI  # local import to avoid mandatory dependency
@@ -23,38 +39,167 @@ class SimpleOpenAIEmbeddings(Embeddings):
                 " `pip install openai` or include it in requirements."
             ) from exc
 
-        self._client = OpenAI()
+        # retries are handled here (with backoff across the whole pool), not per client call
+        self._client = OpenAI(max_retries=0)
+        self._async_client = None
         self._model = model
-        self._batch_size = max(1, batch_size)
+        # provider limit: 2048 inputs per request
+        self._batch_size = min(2048, max(1, batch_size))
+        self._max_batch_tokens = max(1, max_batch_tokens)
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_retries = max(0, max_retries)
 
     @staticmethod
     def _clean_texts(texts: Sequence[str]) -> List[str]:
         return [t.replace("\n", " ") for t in texts]
 
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # conservative estimate without tiktoken (~3 chars per token for German text)
+        return len(text) // 3 + 1
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        batches: List[List[str]] = []
+        current: List[str] = []
+        tokens = 0
+        for text in texts:
+            cost = self._estimate_tokens(text)
+            if current and (len(current) >= self._batch_size or tokens + cost > self._max_batch_tokens):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(text)
+            tokens += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _is_retryable(exc: Exception) -> bool:
+        try:
+            import openai
+        except ImportError:  # pragma: no cover
+            return False
+        return isinstance(
+            exc,
+            (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError),
+        )
+
+    @staticmethod
+    def _backoff(attempt: int, exc: Exception) -> float:
+        response = getattr(exc, "response", None)
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        try:
+            if retry_after:
+                return min(60.0, float(retry_after))
+        except ValueError:
+            pass
+        return min(60.0, 0.5 * (2 ** attempt)) * (0.5 + random.random())
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self._max_retries + 1):
+            try:
+                with span("embedding_api", self._model, texts=len(batch)):
+                    response = self._client.embeddings.create(model=self._model, input=batch)
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            except Exception as exc:
+                if attempt >= self._max_retries or not self._is_retryable(exc):
+                    raise
+                time.sleep(self._backoff(attempt, exc))
+        raise AssertionError("unreachable")
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        cleaned = self._clean_texts(texts)
+        batches = self._batches(self._clean_texts(texts))
+        if len(batches) <= 1 or self._max_concurrency == 1:
+            parts = [self._embed_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self._max_concurrency, len(batches))) as pool:
+                # map keeps batch order, so results line up with the inputs
+                parts = list(pool.map(self._embed_batch, batches))
         results: List[List[float]] = []
-
-        for start in range(0, len(cleaned), self._batch_size):
-            batch = cleaned[start : start + self._batch_size]
-            response = self._client.embeddings.create(
-                model=self._model,
-                input=list(batch),
-            )
-            results.extend([item.embedding for item in response.data])
+        for part in parts:
+            results.extend(part)
         return results
 
     def embed_query(self, text: str) -> List[float]:
-        response = self._client.embeddings.create(
-            model=self._model,
-            input=[text.replace("\n", " ")],
-        )
-        return response.data[0].embedding
+        return self._embed_batch([text.replace("\n", " ")])[0]
+
+    def _aclient(self):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(max_retries=0)
+        return self._async_client
+
+    async def _aembed_batch(self, batch: List[str]) -> List[List[float]]:
+        client = self._aclient()
+        for attempt in range(self._max_retries + 1):
+            try:
+                with span("embedding_api", self._model, texts=len(batch)):
+                    response = await client.embeddings.create(model=self._model, input=batch)
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            except Exception as exc:
+                if attempt >= self._max_retries or not self._is_retryable(exc):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, exc))
+        raise AssertionError("unreachable")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def run(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        parts = await asyncio.gather(*(run(b) for b in self._batches(self._clean_texts(texts))))
+        results: List[List[float]] = []
+        for part in parts:
+            results.extend(part)
+        return results
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed_batch([text.replace("\n", " ")]))[0]
 
 
 def build_openai_embeddings(*, model: str) -> Embeddings:
-    return SimpleOpenAIEmbeddings(model=model)
+    return SimpleOpenAIEmbeddings(
+        model=model,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+        max_batch_tokens=int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "100000")),
+        max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+        max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "6")),
+    )
 
 
 def build_hf_embeddings(*, model: str) -> Embeddings:
     return HuggingFaceEmbeddings(model_name=model)
+
+
+_EMBEDDINGS: Dict[Tuple[str, str], Embeddings] = {}
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def get_embeddings(*, provider: str, model: str) -> Embeddings:
+    """Return the process-wide embedding model for (provider, model).
+
+    Building an embedding client (or loading a HuggingFace model) is expensive,
+    so every caller shares one instance per key instead of constructing it per query.
+    """
+    key = (provider.lower(), model)
+    emb = _EMBEDDINGS.get(key)
+    if emb is not None:
+        return emb
+    with _EMBEDDINGS_LOCK:
+        emb = _EMBEDDINGS.get(key)
+        if emb is None:
+            if key[0] == "openai":
+                emb = build_openai_embeddings(model=model)
+            else:
+                emb = build_hf_embeddings(model=model)
+            _EMBEDDINGS[key] = emb
+    return emb
+
+
+def register_embeddings(*, provider: str, model: str, embeddings: Embeddings) -> None:
+    """Use ``embeddings`` for (provider, model), e.g. a deterministic fake for offline benchmarks."""
+    with _EMBEDDINGS_LOCK:
+        _EMBEDDINGS[(provider.lower(), model)] = embeddings
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import shutil
+import uuid
+from pathlib import Path
+from typing import ContextManager, List, Optional
+
+from app.filelock import file_lock
+
+# Published index generations live in <INDEX_DIR>/generations/gNNNNNN and are never
+# modified afterwards; <INDEX_DIR>/CURRENT names the live one and is swapped
+# atomically. Readers keep their loaded (memory-mapped) generation until they see
+# a new CURRENT, writers build the next generation next to it.
+CURRENT_NAME = "CURRENT"
+GENERATIONS_DIR = "generations"
+INDEX_KEEP_GENERATIONS = max(1, int(os.getenv("INDEX_KEEP_GENERATIONS", "2")))
+_GEN_RE = re.compile(r"^g(\d{6,})$")
+# files of the pre-generation layout directly in INDEX_DIR
+_LEGACY = ("index.faiss", "index.pkl", "docstore.sqlite", "manifest.json", "index_meta.json", "lexical")
+
+
+def current_dir(root: Path) -> Optional[Path]:
+    """Directory of the live generation, the legacy flat layout, or None if there is no index."""
+    try:
+        name = (root / CURRENT_NAME).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        name = ""
+    if name:
+        path = root / GENERATIONS_DIR / name
+        if path.is_dir():
+            return path
+    if (root / "index.faiss").exists():
+        return root
+    return None
+
+
+def writer_lock(root: Path) -> ContextManager[None]:
+    """Cross-process lock for everything that writes the index (server workers, CLI)."""
+    return file_lock(root.with_name(root.name + ".writer.lock"))
+
+
+def workspace(root: Path) -> Path:
+    """Fresh, unpublished directory for the next generation (same filesystem as the live one)."""
+    base = root / GENERATIONS_DIR
+    base.mkdir(parents=True, exist_ok=True)
+    path = base / f".new-{uuid.uuid4().hex[:12]}"
+    path.mkdir()
+    return path
+
+
+def _generations(base: Path) -> List[Path]:
+    if not base.is_dir():
+        return []
+    return sorted((p for p in base.iterdir() if _GEN_RE.match(p.name)), key=lambda p: int(p.name[1:]))
+
+
+def publish(root: Path, src: Path) -> Path:
+    """Move the finished directory ``src`` in as the next generation and make it current.
+
+    Must be called under :func:`writer_lock`. Older generations beyond
+    INDEX_KEEP_GENERATIONS are removed afterwards.
+    """
+    base = root / GENERATIONS_DIR
+    base.mkdir(parents=True, exist_ok=True)
+    existing = _generations(base)
+    name = f"g{(int(existing[-1].name[1:]) + 1) if existing else 1:06d}"
+    target = base / name
+    os.replace(src, target)
+    tmp = root / (CURRENT_NAME + ".tmp")
+    tmp.write_text(name, encoding="utf-8")
+    os.replace(tmp, root / CURRENT_NAME)
+    _cleanup(root, base)
+    return target
+
+
+def _cleanup(root: Path, base: Path) -> None:
+    for path in _generations(base)[:-INDEX_KEEP_GENERATIONS]:
+        # Windows refuses while another process still maps the files; retried on the next publish
+        shutil.rmtree(path, ignore_errors=True)
+    for path in base.glob(".new-*"):
+        # left over from an interrupted update (the writer lock is held, so none is in use)
+        shutil.rmtree(path, ignore_errors=True)
+    for name in _LEGACY:
+        path = root / name
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+        except OSError:
+            logging.warning(f"Alte Indexdatei konnte nicht entfernt werden: {path}", exc_info=True)
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _env(key: str, default: str) -> str:
+    return os.getenv(key, default)
+
+
+# flat | hnsw | ivf_flat | ivf_pq
+FAISS_INDEX_TYPE = _env("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_NLIST = int(_env("FAISS_NLIST", "0"))  # 0 = 4 * sqrt(n)
+FAISS_PQ_M = int(_env("FAISS_PQ_M", "16"))
+FAISS_PQ_NBITS = int(_env("FAISS_PQ_NBITS", "8"))
+FAISS_HNSW_M = int(_env("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(_env("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_TRAIN_SAMPLE = int(_env("FAISS_TRAIN_SAMPLE", "100000"))
+# Suchparameter (Abfragezeit)
+FAISS_NPROBE = int(_env("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(_env("FAISS_EF_SEARCH", "64"))
+# Dokument-Filter bis zu dieser Größe werden exakt über die Teilmenge gesucht
+FAISS_EXACT_SUBSET = int(_env("FAISS_EXACT_SUBSET", "20000"))
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+META_NAME = "index_meta.json"
+_BATCH = 65536
+
+
+def index_type_of(index) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def _pq_m(d: int, m: int) -> int:
+    """Largest number of sub-quantizers <= m that divides the dimension."""
+    for cand in range(min(m, d), 0, -1):
+        if d % cand == 0:
+            return cand
+    return 1
+
+
+def plan_layout(n: int, d: int, index_type: str = FAISS_INDEX_TYPE) -> Dict[str, Any]:
+    """Concrete parameters for ``index_type`` at ``n`` vectors.
+
+    Corpora too small to train the requested layout are kept flat: FAISS wants
+    about 39 training vectors per IVF list and per PQ centroid, i.e. at least
+    39 * 2**nbits (9984 with nbits=8) for IVF-PQ, counted on the training sample.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unbekannter FAISS_INDEX_TYPE '{index_type}'. Erlaubt: {', '.join(INDEX_TYPES)}")
+    layout: Dict[str, Any] = {"type": index_type, "requested": index_type}
+    if index_type == "hnsw":
+        layout.update(m=FAISS_HNSW_M, ef_construction=FAISS_HNSW_EF_CONSTRUCTION)
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        trainable = min(n, FAISS_TRAIN_SAMPLE)
+        nlist = FAISS_NLIST or int(4 * math.sqrt(max(n, 1)))
+        nlist = min(nlist, trainable // 39)
+        if nlist < 2 or (index_type == "ivf_pq" and trainable < 39 * 2 ** FAISS_PQ_NBITS):
+            return {"type": "flat", "requested": index_type}
+        layout["nlist"] = nlist
+        if index_type == "ivf_pq":
+            layout.update(m=_pq_m(d, FAISS_PQ_M), nbits=FAISS_PQ_NBITS)
+    return layout
+
+
+def _empty_index(d: int, metric: int, layout: Dict[str, Any]):
+    import faiss
+
+    kind = layout["type"]
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, layout["m"], metric)
+        index.hnsw.efConstruction = layout["ef_construction"]
+        return index
+    if kind in ("ivf_flat", "ivf_pq"):
+        quantizer = faiss.IndexFlatIP(d) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(d)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, layout["nlist"], metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, layout["nlist"], layout["m"], layout["nbits"], metric)
+        return index
+    return faiss.IndexFlatIP(d) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(d)
+
+
+def _vectors(index, start: int, end: int) -> np.ndarray:
+    return np.asarray(index.reconstruct_n(start, end - start), dtype=np.float32)
+
+
+def build_from(source, layout: Dict[str, Any], *, seed: int = 0):
+    """Copy all vectors of ``source`` into a new index of ``layout``, keeping positions."""
+    import faiss
+
+    n, d = int(source.ntotal), int(source.d)
+    if index_type_of(source) in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(source).make_direct_map()
+    index = _empty_index(d, source.metric_type, layout)
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(n, FAISS_TRAIN_SAMPLE), replace=False))
+        index.train(np.asarray(source.reconstruct_batch(sample), dtype=np.float32))
+        layout["trained_on"] = int(len(sample))
+    for start in range(0, n, _BATCH):
+        index.add(_vectors(source, start, min(n, start + _BATCH)))
+    return index
+
+
+def apply_layout(vs, index_dir: Optional[Path] = None):
+    """Convert ``vs.index`` to the configured layout if needed; returns the layout."""
+    index = vs.index
+    layout = plan_layout(int(index.ntotal), int(index.d))
+    if layout["type"] != index_type_of(index):
+        t0 = time.perf_counter()
+        vs.index = build_from(index, layout)
+        logging.info(f"FAISS-Index als {layout['type']} aufgebaut ({index.ntotal} Vektoren, {time.perf_counter() - t0:.1f}s)")
+    else:
+        layout = read_meta(index_dir) if index_dir else layout
+        layout = layout or {"type": index_type_of(index), "requested": FAISS_INDEX_TYPE}
+    layout["ntotal"] = int(vs.index.ntotal)
+    return layout
+
+
+def read_meta(index_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with (index_dir / META_NAME).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_meta(index_dir: Path, layout: Dict[str, Any]) -> None:
+    tmp = index_dir / (META_NAME + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+    os.replace(tmp, index_dir / META_NAME)
+
+
+def supports_delete(index) -> bool:
+    """Only flat indexes renumber positions on remove_ids as LangChain's FAISS.delete expects."""
+    return index_type_of(index) == "flat"
+
+
+def prepare_for_search(index) -> None:
+    """Set query-time parameters once after loading."""
+    import faiss
+
+    kind = index_type_of(index)
+    if kind == "hnsw":
+        index.hnsw.efSearch = FAISS_EF_SEARCH
+    elif kind in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = FAISS_NPROBE
+        # direct map: needed for reconstruct() in exact subset searches
+        ivf.make_direct_map()
+
+
+def search_parameters(index, selector):
+    """SearchParameters with the selector and the layout's query-time knobs."""
+    import faiss
+
+    kind = index_type_of(index)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=FAISS_EF_SEARCH)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=FAISS_NPROBE)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _held_out(index, queries: int, seed: int):
+    """Split ``index`` into query vectors and a flat index of the remaining vectors.
+
+    Queries taken from the indexed vectors themselves would find themselves at
+    rank 1 and inflate recall, so they are removed from the searched corpus.
+    """
+    import faiss
+
+    n = int(index.ntotal)
+    if index_type_of(index) in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).make_direct_map()
+    rng = np.random.default_rng(seed)
+    drop = np.sort(rng.choice(n, size=max(1, min(queries, n // 10)), replace=False))
+    keep = np.ones(n, dtype=bool)
+    keep[drop] = False
+    base = _empty_index(int(index.d), index.metric_type, {"type": "flat"})
+    for start in range(0, n, _BATCH):
+        end = min(n, start + _BATCH)
+        base.add(_vectors(index, start, end)[keep[start:end]])
+    return np.asarray(index.reconstruct_batch(drop), dtype=np.float32), base
+
+
+def recall_report(
+    index,
+    types: List[str],
+    *,
+    k: int = 10,
+    queries: int = 200,
+    seed: int = 0,
+    query_vectors: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """recall@k and latency of each layout against exact search over the same vectors.
+
+    Queries are ``query_vectors`` (e.g. embedded real questions) searched over all
+    vectors, or otherwise up to ``queries`` held-out vectors of the index searched
+    over the rest.
+    """
+    import faiss
+
+    if int(index.ntotal) < 2:
+        return []
+    if query_vectors is not None:
+        q = np.asarray(query_vectors, dtype=np.float32)
+        baseline = build_from(index, {"type": "flat"})
+    else:
+        q, baseline = _held_out(index, queries, seed)
+    index = baseline
+    n = int(index.ntotal)
+    _, truth = baseline.search(q, k)
+    report = []
+    for kind in types:
+        layout = plan_layout(n, int(index.d), kind)
+        t0 = time.perf_counter()
+        candidate = build_from(index, layout)
+        build_s = time.perf_counter() - t0
+        prepare_for_search(candidate)
+        t0 = time.perf_counter()
+        _, found = candidate.search(q, k)
+        search_s = time.perf_counter() - t0
+        hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+        report.append(
+            {
+                "layout": layout,
+                f"recall@{k}": round(hits / (len(q) * k), 4),
+                "ms_per_query": round(1000 * search_s / len(q), 3),
+                "build_seconds": round(build_s, 2),
+                "bytes": int(faiss.serialize_index(candidate).nbytes),
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    import faiss
+
+    from app.paths import get_index_dir
+    from app.vectorstore.generations import current_dir
+
+    p = argparse.ArgumentParser(description="recall@k der FAISS-Layouts gegen die exakte Suche")
+    p.add_argument("--types", default="hnsw,ivf_flat,ivf_pq")
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--queries", type=int, default=200, help="Anzahl zurückgehaltener Index-Vektoren als Anfragen")
+    p.add_argument("--query-file", help="Echte Anfragen (eine je Zeile), mit dem konfigurierten Modell eingebettet")
+    args = p.parse_args()
+    live_dir = current_dir(get_index_dir())
+    if live_dir is None:
+        raise SystemExit(f"Kein FAISS-Index unter {get_index_dir()}")
+    live = faiss.read_index(str(live_dir / "index.faiss"))
+    if index_type_of(live) == "ivf_pq":
+        print("[WARN] Live-Index ist IVF-PQ: die Baseline nutzt rekonstruierte (genäherte) Vektoren.")
+    if index_type_of(live) != "flat":
+        prepare_for_search(live)
+    query_vectors = None
+    if args.query_file:
+        from app.vectorstore.retriever import _embedding
+
+        texts = [t.strip() for t in Path(args.query_file).read_text(encoding="utf-8").splitlines() if t.strip()]
+        query_vectors = np.asarray(_embedding().embed_documents(texts), dtype=np.float32)
+    types = [t.strip() for t in args.types.split(",") if t.strip()]
+    report = recall_report(live, types, k=args.k, queries=args.queries, query_vectors=query_vectors)
+    print(json.dumps(report, indent=2))
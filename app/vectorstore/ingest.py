@@ -1,15 +1,29 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import logging
 import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.vectorstore.embeddings import build_hf_embeddings, build_openai_embeddings
+from app.vectorstore.embeddings import get_embeddings
+from app.vectorstore.embedding_cache import get_cached_embeddings
+from app.vectorstore.lexical import LEXICAL_DIR, LexicalIndex
+from app.vectorstore.serving import DOCSTORE_NAME, write_docstore
+from app.vectorstore.index_factory import FAISS_INDEX_TYPE, apply_layout, supports_delete, write_meta
+from app.vectorstore.page_cache import remove_pages, write_pages
+from app.vectorstore.generations import current_dir, publish, workspace, writer_lock
 from app.paths import get_docs_dir, get_index_dir
 try:
     from app.api.docs_registry import add_document as _add_doc
@@ -25,33 +39,182 @@ def _env(key: str, default: str) -> str:
 DOCS_DIR = str(get_docs_dir())
 CHUNK_SIZE = int(_env("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(_env("CHUNK_OVERLAP", "150"))
+# Chunks pro Embedding-/FAISS-Batch und Batches pro Checkpoint (Speichergrenze bzw. Wiederaufsetzpunkt)
+INGEST_BATCH_CHUNKS = int(_env("INGEST_BATCH_CHUNKS", "256"))
+INGEST_CHECKPOINT_EVERY = int(_env("INGEST_CHECKPOINT_EVERY", "20"))
+# Prozesse für die Textextraktion; große PDFs werden in Seitenbereiche aufgeteilt
+INGEST_WORKERS = int(_env("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_PAGES_PER_TASK = int(_env("INGEST_PAGES_PER_TASK", "50"))
 
+MANIFEST_NAME = "manifest.json"
+_SUPPORTED_SUFFIXES = (".md", ".txt", ".pdf")
+# Fortschritts-Callback (Phase + Zähler aus IngestStats), z. B. für Ingest-Jobs
+Progress = Optional[Callable[[Dict[str, Any]], None]]
 
-def _embedding():
+
+def _embedding_key() -> Tuple[str, str]:
     provider = _env("EMBEDDINGS_PROVIDER", "huggingface").lower()
     if provider == "openai":
         model = _env("EMBEDDING_MODEL", "text-embedding-3-small")
-        return build_openai_embeddings(model=model)
     else:
         model = _env("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        return build_hf_embeddings(model=model)
+    return provider, model
 
 
-def _load_documents() -> List[Document]:
-    docs: List[Document] = []
+def _embedding():
+    provider, model = _embedding_key()
+    if _env("EMBEDDING_CACHE", "true").lower() == "true":
+        # unchanged chunks are served from the on-disk cache instead of being re-embedded
+        return get_cached_embeddings(provider=provider, model=model)
+    return get_embeddings(provider=provider, model=model)
+
+
+def _source_files() -> List[Path]:
     base = Path(DOCS_DIR)
     base.mkdir(parents=True, exist_ok=True)
-
+    files = []
     for path in base.rglob("*"):
-        if path.is_dir():
+        if path.is_dir() or path.name.startswith("."):
+            continue
+        if any(part.startswith(".") for part in path.relative_to(base).parts):
             continue
-        p = str(path)
-        if p.lower().endswith((".md", ".txt")):
-            docs.extend(TextLoader(p, autodetect_encoding=True).load())
-        elif p.lower().endswith(".pdf"):
-            docs.extend(PyPDFLoader(p).load())
+        if path.name.lower().endswith(_SUPPORTED_SUFFIXES):
+            files.append(path)
+    return sorted(files)
+
+
+def _rel(path: Path) -> str:
+    return path.relative_to(Path(DOCS_DIR)).as_posix()
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_file(path: str) -> List[Document]:
+    """Parse one file into page documents (runs in worker processes)."""
+    if path.lower().endswith((".md", ".txt")):
+        return TextLoader(path, autodetect_encoding=True).load()
+    if path.lower().endswith(".pdf"):
+        return PyPDFLoader(path).load()
+    return []
+
+
+def _read_pdf_pages(path: str, start: int, end: int) -> List[Document]:
+    """Extract pages [start, end) of a large PDF (runs in worker processes)."""
+    from pypdf import PdfReader
 
-    # Annotate metadata with file_name and doc_id (stable)
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    docs: List[Document] = []
+    for i in range(start, min(end, total)):
+        try:
+            label = reader.page_labels[i]
+        except Exception:
+            label = str(i + 1)
+        docs.append(
+            Document(
+                page_content=reader.pages[i].extract_text() or "",
+                metadata={"source": path, "page": i, "total_pages": total, "page_label": label},
+            )
+        )
+    return docs
+
+
+def _finish_file(path: Path, docs: List[Document]) -> List[Document]:
+    _annotate(docs)
+    if docs and str(path).lower().endswith(".pdf"):
+        _cache_pages(path, docs)
+    return docs
+
+
+def _load_file(path: Path) -> List[Document]:
+    return _finish_file(path, _read_file(str(path)))
+
+
+def _cache_pages(path: Path, docs: List[Document]) -> None:
+    """Persist the parsed page texts so the /chat doc fallback never re-parses the PDF."""
+    doc_id = (docs[0].metadata or {}).get("doc_id")
+    if not doc_id:
+        return
+    try:
+        write_pages(doc_id, path, (d.page_content for d in docs))
+    except OSError as exc:
+        print(f"[WARN] Seiten-Cache für {path.name} nicht geschrieben: {exc}", flush=True)
+
+
+def _plan(path: Path) -> List[Tuple[Callable[..., List[Document]], tuple]]:
+    """Split a file into extraction tasks: whole file, or page ranges for very large PDFs."""
+    p = str(path)
+    if p.lower().endswith(".pdf") and INGEST_PAGES_PER_TASK > 0:
+        try:
+            from pypdf import PdfReader
+
+            total = len(PdfReader(p).pages)
+        except Exception:
+            total = 0
+        if total > INGEST_PAGES_PER_TASK:
+            return [
+                (_read_pdf_pages, (p, start, start + INGEST_PAGES_PER_TASK))
+                for start in range(0, total, INGEST_PAGES_PER_TASK)
+            ]
+    return [(_read_file, (p,))]
+
+
+def _log_failure(path: Path, exc: BaseException) -> None:
+    logging.error(f"Ingest: {path} konnte nicht gelesen werden: {exc}", exc_info=exc)
+    print(f"[WARN] {path.name} übersprungen: {exc}", flush=True)
+
+
+def _iter_loaded(files: List[Path]) -> Iterator[Tuple[Path, List[Document]]]:
+    """Yield (path, annotated page documents) in input order.
+
+    With INGEST_WORKERS > 1 the extraction runs on a process pool with a bounded
+    window of files in flight; a file that fails to parse is logged and skipped.
+    """
+    if INGEST_WORKERS <= 1 or len(files) <= 1 and not any(len(_plan(p)) > 1 for p in files):
+        for path in files:
+            try:
+                docs = _read_file(str(path))
+            except Exception as exc:
+                _log_failure(path, exc)
+                continue
+            yield path, _finish_file(path, docs)
+        return
+
+    pending = iter(files)
+    window: Deque[Tuple[Path, List[Future]]] = deque()
+    with ProcessPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+
+        def fill() -> None:
+            while len(window) < INGEST_WORKERS * 2:
+                path = next(pending, None)
+                if path is None:
+                    return
+                window.append((path, [pool.submit(fn, *args) for fn, args in _plan(path)]))
+
+        fill()
+        while window:
+            path, futures = window.popleft()
+            try:
+                docs = [d for f in futures for d in f.result()]
+            except Exception as exc:
+                for f in futures:
+                    f.cancel()
+                _log_failure(path, exc)
+                docs = None
+            fill()
+            if docs is not None:
+                yield path, _finish_file(path, docs)
+
+
+def _annotate(docs: List[Document]) -> None:
+    """Annotate metadata with file_name and doc_id (stable)."""
+    doc_ids: Dict[str, str | None] = {}
     for d in docs:
         try:
             src = (d.metadata or {}).get("source") or (d.metadata or {}).get("file_path") or ""
@@ -59,70 +222,483 @@ def _load_documents() -> List[Document]:
             d.metadata = dict(d.metadata or {})
             d.metadata["file_name"] = base
             if _add_doc is not None:
-                try:
-                    doc_id = _add_doc(base)
-                    d.metadata["doc_id"] = doc_id
-                except Exception:
-                    pass
+                if base not in doc_ids:
+                    try:
+                        doc_ids[base] = _add_doc(base)
+                    except Exception:
+                        doc_ids[base] = None
+                if doc_ids[base]:
+                    d.metadata["doc_id"] = doc_ids[base]
         except Exception:
             pass
 
+
+def _ensure_example(base: Path) -> Path:
+    default_md = base / "example.md"
+    if not default_md.exists():
+        default_md.write_text(
+            "# Beispiel\n\n"
+            "Dies ist ein Beispiel-Dokument für das RAG-System.\n"
+            "Es beschreibt, wie das Projekt aufgebaut ist und dient als Test.\n",
+            encoding="utf-8",
+        )
+    return default_md
+
+
+def _load_documents() -> List[Document]:
+    docs: List[Document] = []
+    for path in _source_files():
+        docs.extend(_load_file(path))
+
     if not docs:
         # Fallback: Beispielcontent
-        default_md = base / "example.md"
-        if not default_md.exists():
-            default_md.write_text(
-                "# Beispiel\n\n"
-                "Dies ist ein Beispiel-Dokument für das RAG-System.\n"
-                "Es beschreibt, wie das Projekt aufgebaut ist und dient als Test.\n",
-                encoding="utf-8",
-            )
-        docs.extend(TextLoader(str(default_md), autodetect_encoding=True).load())
+        docs.extend(_load_file(_ensure_example(Path(DOCS_DIR))))
 
     return docs
 
 
-def build_index():
-    docs = _load_documents()
-    if not docs:
-        print(
-            "[INFO] Keine Dokumente zum Indizieren gefunden – vorhandener Index wird entfernt.",
-            flush=True,
-        )
-        index_dir = str(get_index_dir())
-        index_path = Path(index_dir)
-        if index_path.exists():
-            shutil.rmtree(index_path)
-        return
-
-    splitter = RecursiveCharacterTextSplitter(
+def _splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
     )
-    chunks = splitter.split_documents(docs)
+
+
+def _file_entry(path: Path, sha: str, chunks: List[Document]) -> Dict[str, Any]:
+    st = path.stat()
+    doc_id = next((c.metadata.get("doc_id") for c in chunks if c.metadata.get("doc_id")), None)
+    return {
+        "sha256": sha,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "doc_id": doc_id,
+        "ids": [uuid.uuid4().hex for _ in chunks],
+    }
+
+
+def _load_manifest(index_dir: Path) -> Dict[str, Any] | None:
+    try:
+        with (index_dir / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        return None
+    return data
+
+
+def _save_manifest(index_dir: Path, manifest: Dict[str, Any]) -> None:
+    tmp = index_dir / (MANIFEST_NAME + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, index_dir / MANIFEST_NAME)
+
+
+def _new_manifest() -> Dict[str, Any]:
+    provider, model = _embedding_key()
+    return {
+        "version": 1,
+        "embedding": f"{provider}:{model}",
+        "chunking": [CHUNK_SIZE, CHUNK_OVERLAP],
+        "index_type": FAISS_INDEX_TYPE,
+        "files": {},
+    }
+
+
+def _compatible(manifest: Dict[str, Any]) -> bool:
+    """Manifest was built with the current embedding model, chunking and FAISS layout."""
+    fresh = _new_manifest()
+    return (
+        manifest.get("embedding") == fresh["embedding"]
+        and manifest.get("chunking") == fresh["chunking"]
+        and manifest.get("index_type", "flat") == fresh["index_type"]
+    )
+
+
+def _chunk_texts(vs: FAISS, ids: Iterable[str]) -> List[str]:
+    out = []
+    for i in ids:
+        doc = vs.docstore.search(i)
+        out.append(doc.page_content if isinstance(doc, Document) else "")
+    return out
+
+
+def _write_lexical(
+    vs: FAISS,
+    index_dir: Path,
+    *,
+    removed: Iterable[str] = (),
+    added: List[str] | None = None,
+    source: Path | None = None,
+) -> None:
+    """Write the BM25 index to ``index_dir``: the one in ``source`` (default ``index_dir``)
+    updated incrementally, or a full rebuild if that is missing or ``added`` is None."""
+    lexical = LexicalIndex.load(source or index_dir) if added is not None else None
+    if lexical is None:
+        ids = list(vs.index_to_docstore_id.values())
+        lexical = LexicalIndex.build(ids, _chunk_texts(vs, ids))
+    else:
+        lexical = lexical.updated(remove=removed, add_ids=added, add_texts=_chunk_texts(vs, added))
+    lexical.save(index_dir)
+
+
+def _remove_index(index_path: Path) -> None:
+    print(
+        "[INFO] Keine Dokumente zum Indizieren gefunden – vorhandener Index wird entfernt.",
+        flush=True,
+    )
+    if index_path.exists():
+        shutil.rmtree(index_path)
+
+
+def _staging_dir(index_path: Path) -> Path:
+    return index_path.with_name(index_path.name + ".staging")
+
+
+class IngestStats:
+    """Counters and throughput of one ingest run."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.embeddings = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embeddings": self.embeddings,
+            "seconds": round(elapsed, 3),
+            "pages_per_s": round(self.pages / elapsed, 2),
+            "chunks_per_s": round(self.chunks / elapsed, 2),
+            "embeddings_per_s": round(self.embeddings / elapsed, 2),
+        }
+
+    def line(self) -> str:
+        d = self.as_dict()
+        return (
+            f"{d['files']} Dateien, {d['pages']} Seiten, {d['chunks']} Chunks in {d['seconds']}s "
+            f"({d['pages_per_s']} Seiten/s, {d['chunks_per_s']} Chunks/s, {d['embeddings_per_s']} Embeddings/s)"
+        )
+
+
+def _iter_file_chunks(files: Iterable[Path], stats: IngestStats) -> Iterator[Tuple[Path, List[Document]]]:
+    """Load and split one file at a time, so only a single document's pages are in memory."""
+    splitter = _splitter()
+    for path, pages in _iter_loaded(list(files)):
+        stats.files += 1
+        stats.pages += len(pages)
+        yield path, splitter.split_documents(pages)
+
+
+def _ingest_files(
+    vs: FAISS | None,
+    emb,
+    files: Iterable[Path],
+    manifest: Dict[str, Any],
+    stats: IngestStats,
+    *,
+    shas: Dict[str, str] | None = None,
+    checkpoint: Callable[[FAISS], None] | None = None,
+    progress: Progress = None,
+) -> FAISS | None:
+    """Embed chunks in bounded batches and add them to ``vs`` (created on the first batch).
+
+    A file is recorded in ``manifest`` only once all of its chunks were added,
+    so a checkpointed manifest never lists partially indexed files.
+    """
+    batch: List[Tuple[str, str, Document]] = []
+    remaining: Dict[str, int] = {}
+    entries: Dict[str, Dict[str, Any]] = {}
+    batches_since_checkpoint = 0
+
+    def flush() -> None:
+        nonlocal vs, batch, batches_since_checkpoint
+        texts = [c.page_content for _, _, c in batch]
+        vectors = emb.embed_documents(texts)
+        stats.embeddings += len(vectors)
+        pairs = list(zip(texts, vectors))
+        metadatas = [c.metadata for _, _, c in batch]
+        ids = [i for _, i, _ in batch]
+        if vs is None:
+            vs = FAISS.from_embeddings(pairs, emb, metadatas=metadatas, ids=ids)
+        else:
+            vs.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+        for rel, _, _ in batch:
+            remaining[rel] -= 1
+        for rel in [r for r, n in remaining.items() if n == 0]:
+            manifest["files"][rel] = entries.pop(rel)
+            del remaining[rel]
+        batch = []
+        if progress is not None:
+            progress({"phase": "embedding", **stats.as_dict()})
+        batches_since_checkpoint += 1
+        if checkpoint is not None and batches_since_checkpoint >= INGEST_CHECKPOINT_EVERY:
+            checkpoint(vs)
+            batches_since_checkpoint = 0
+
+    for path, chunks in _iter_file_chunks(files, stats):
+        if not chunks:
+            continue
+        rel = _rel(path)
+        sha = (shas or {}).get(rel) or _file_sha256(path)
+        entry = _file_entry(path, sha, chunks)
+        entries[rel] = entry
+        remaining[rel] = len(chunks)
+        stats.chunks += len(chunks)
+        for chunk_id, chunk in zip(entry["ids"], chunks):
+            batch.append((rel, chunk_id, chunk))
+            if len(batch) >= INGEST_BATCH_CHUNKS:
+                flush()
+    if batch:
+        flush()
+    return vs
+
+
+def _resume(staging: Path, emb, files: List[Path]) -> Tuple[FAISS | None, Dict[str, Any], List[Path]]:
+    """Continue an interrupted build from its staging checkpoint, if compatible."""
+    manifest = _load_manifest(staging)
+    if (
+        manifest is None
+        or manifest.get("complete", True)
+        or not _compatible(manifest)
+        or not (staging / "index.faiss").exists()
+    ):
+        shutil.rmtree(staging, ignore_errors=True)
+        fresh = _new_manifest()
+        fresh["complete"] = False
+        return None, fresh, files
+
+    vs = FAISS.load_local(str(staging), emb, allow_dangerous_deserialization=True)
+    known: Dict[str, Dict[str, Any]] = manifest["files"]
+    current = {_rel(p): p for p in files}
+    todo: List[Path] = []
+    for rel, path in current.items():
+        entry = known.get(rel)
+        st = path.stat()
+        if entry and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            continue
+        known.pop(rel, None)
+        todo.append(path)
+    for rel in [r for r in known if r not in current]:
+        known.pop(rel)
+    # drop vectors of files that were not completed (or changed) before the interruption
+    keep = {i for entry in known.values() for i in entry.get("ids") or []}
+    orphans = [i for i in vs.index_to_docstore_id.values() if i not in keep]
+    if orphans:
+        vs.delete(orphans)
+    print(f"[INFO] Setze unterbrochene Indizierung fort ({len(known)} Dateien bereits indiziert).", flush=True)
+    return vs, manifest, todo
+
+
+def build_index(progress: Progress = None) -> Dict[str, Any] | None:
+    """Full rebuild as a streaming pipeline: load -> split -> embed -> add, in bounded batches.
+
+    Progress is checkpointed to a staging directory next to the index every
+    INGEST_CHECKPOINT_EVERY batches; an interrupted run resumes from there.
+    The finished index is published as a new generation, so readers keep the
+    previous one until then. ``progress`` receives the running counters.
+    """
+    with writer_lock(get_index_dir()):
+        return _build_index(progress)
+
+
+def _build_index(progress: Progress) -> Dict[str, Any] | None:
+    backend = _env("VECTORSTORE_BACKEND", "faiss").lower()
+    if backend != "faiss":
+        raise ValueError(
+            f"Unbekannter VECTORSTORE_BACKEND '{backend}'. Erlaubt: faiss"
+        )
+
+    index_path = get_index_dir()
+    staging = _staging_dir(index_path)
+    files = _source_files() or [_ensure_example(Path(DOCS_DIR))]
     emb = _embedding()
+    stats = IngestStats()
+
+    vs, manifest, todo = _resume(staging, emb, files)
+
+    def checkpoint(current: FAISS) -> None:
+        staging.mkdir(parents=True, exist_ok=True)
+        current.save_local(str(staging))
+        _save_manifest(staging, manifest)
+        print(f"[INFO] Checkpoint: {stats.line()}", flush=True)
+
+    try:
+        vs = _ingest_files(vs, emb, todo, manifest, stats, checkpoint=checkpoint, progress=progress)
+    except Exception as exc:
+        raise RuntimeError(
+            "Konnte den FAISS-Index nicht aufbauen. Prüfe bitte, ob die Embedding-API "
+            "erreichbar ist (z. B. Proxy-Konfiguration) oder wechsle per "
+            "EMBEDDINGS_PROVIDER=huggingface auf lokale Modelle."
+        ) from exc
+
+    if vs is None or vs.index.ntotal == 0:
+        shutil.rmtree(staging, ignore_errors=True)
+        _remove_index(index_path)
+        return None
+
+    manifest["complete"] = True
+    if progress is not None:
+        progress({"phase": "publishing", **stats.as_dict()})
+    staging.mkdir(parents=True, exist_ok=True)
+    _write_lexical(vs, staging)
+    # streamed into a flat index; convert (train on a sample) to the configured layout once at the end
+    layout = apply_layout(vs)
+    vs.save_local(str(staging))
+    write_docstore(vs, staging)
+    write_meta(staging, layout)
+    _save_manifest(staging, manifest)
+    generation = publish(index_path, staging)
+    print(
+        f"[OK] FAISS-Index gespeichert unter: {generation}  (Chunks: {vs.index.ntotal}; {stats.line()})"
+    )
+    return {"mode": "full", "chunks": int(vs.index.ntotal), "throughput": stats.as_dict()}
+
+
+def _publish_update(
+    index_path: Path,
+    vs: FAISS,
+    current: Path,
+    manifest: Dict[str, Any],
+    *,
+    removed: Iterable[str] = (),
+    added: List[str] | None = None,
+) -> None:
+    """Write ``vs`` with its lexical index, docstore and manifest to a new workspace and publish it.
+
+    ``added=None`` rebuilds the lexical index instead of updating the one in ``current``.
+    """
+    work = workspace(index_path)
+    try:
+        _write_lexical(vs, work, removed=removed, added=added, source=current)
+        layout = apply_layout(vs, current)
+        write_docstore(vs, work)
+        vs.save_local(str(work))
+        write_meta(work, layout)
+        _save_manifest(work, manifest)
+        publish(index_path, work)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+
+
+def update_index(progress: Progress = None) -> Dict[str, Any]:
+    """Incremental update against the manifest of content hashes.
+
+    Only new or changed files are loaded, chunked and embedded; vectors of
+    changed or removed files are deleted by their stored ids. The result is
+    published as a new generation. Falls back to build_index() when no usable
+    manifest/index exists or the embedding model or chunking changed.
+    """
+    with writer_lock(get_index_dir()):
+        return _update_index(progress)
+
+
+def _update_index(progress: Progress) -> Dict[str, Any]:
+    index_path = get_index_dir()
     backend = _env("VECTORSTORE_BACKEND", "faiss").lower()
+    if backend != "faiss":
+        raise ValueError(f"Unbekannter VECTORSTORE_BACKEND '{backend}'. Erlaubt: faiss")
 
-    if backend == "faiss":
-        try:
-            vs = FAISS.from_documents(chunks, emb)
-        except Exception as exc:
-            raise RuntimeError(
-                "Konnte den FAISS-Index nicht aufbauen. Prüfe bitte, ob die Embedding-API "
-                "erreichbar ist (z. B. Proxy-Konfiguration) oder wechsle per "
-                "EMBEDDINGS_PROVIDER=huggingface auf lokale Modelle."
-            ) from exc
-        index_dir = _env("INDEX_DIR", "data/index/faiss")
-        os.makedirs(index_dir, exist_ok=True)
-        vs.save_local(index_dir)
-        print(
-            f"[OK] FAISS-Index gespeichert unter: {index_dir}  (Chunks: {len(chunks)})"
-        )
-        return
+    current = current_dir(index_path)
+    manifest = _load_manifest(current) if current is not None else None
+    if (
+        current is None
+        or manifest is None
+        or not _compatible(manifest)
+        or _staging_dir(index_path).exists()
+    ):
+        # no usable index, or an interrupted full build: (re)run the full pipeline
+        return _build_index(progress) or {"mode": "full", "chunks": 0}
+
+    known: Dict[str, Dict[str, Any]] = manifest["files"]
+    sources = {_rel(p): p for p in _source_files()}
+    changed: List[Path] = []
+    shas: Dict[str, str] = {}
+    unchanged = 0
+    for rel, path in sources.items():
+        entry = known.get(rel)
+        st = path.stat()
+        if entry and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            unchanged += 1
+            continue
+        sha = _file_sha256(path)
+        if entry and entry.get("sha256") == sha:
+            # touched but identical content: refresh stat only
+            entry["mtime_ns"], entry["size"] = st.st_mtime_ns, st.st_size
+            unchanged += 1
+            continue
+        shas[rel] = sha
+        changed.append(path)
+    removed = [rel for rel in known if rel not in sources]
+
+    summary: Dict[str, Any] = {
+        "mode": "incremental",
+        "added": sum(1 for p in changed if _rel(p) not in known),
+        "updated": sum(1 for p in changed if _rel(p) in known),
+        "removed": len(removed),
+        "unchanged": unchanged,
+        "chunks_added": 0,
+        "chunks_removed": 0,
+    }
+    if not changed and not removed:
+        # published generations are immutable: refreshed stat entries are not written back
+        # (touched files are hashed again next time); backfills go into a new generation
+        if not (current / LEXICAL_DIR).exists() or not (current / DOCSTORE_NAME).exists():
+            # index from before the lexical index / serving docstore existed
+            vs = FAISS.load_local(str(current), _embedding(), allow_dangerous_deserialization=True)
+            _publish_update(index_path, vs, current, manifest)
+        return summary
+
+    emb = _embedding()
+    vs = FAISS.load_local(str(current), emb, allow_dangerous_deserialization=True)
 
-    raise ValueError(
-        f"Unbekannter VECTORSTORE_BACKEND '{backend}'. Erlaubt: faiss"
+    stale_ids: List[str] = []
+    for rel in removed + [_rel(p) for p in changed]:
+        entry = known.pop(rel, None)
+        if entry:
+            stale_ids.extend(entry.get("ids") or [])
+            if rel in removed and entry.get("doc_id"):
+                remove_pages(entry["doc_id"])
+    present = set(vs.index_to_docstore_id.values())
+    stale_ids = [i for i in stale_ids if i in present]
+    if stale_ids and not supports_delete(vs.index):
+        # HNSW/IVF cannot drop vectors with LangChain's position remapping: rebuild (embeddings come from the cache)
+        print("[INFO] FAISS-Layout unterstützt kein Löschen – baue den Index neu auf.", flush=True)
+        return _build_index(progress) or {"mode": "full", "chunks": 0}
+    if stale_ids:
+        vs.delete(stale_ids)
+        summary["chunks_removed"] = len(stale_ids)
+
+    stats = IngestStats()
+    vs = _ingest_files(vs, emb, changed, manifest, stats, shas=shas, progress=progress)
+    summary["chunks_added"] = stats.chunks
+    summary["throughput"] = stats.as_dict()
+
+    if vs is None or vs.index.ntotal == 0:
+        _remove_index(index_path)
+        return summary
+
+    if progress is not None:
+        progress({"phase": "publishing", **stats.as_dict()})
+    added = [i for p in changed for i in (manifest["files"].get(_rel(p)) or {}).get("ids") or []]
+    _publish_update(index_path, vs, current, manifest, removed=stale_ids, added=added)
+    print(
+        f"[OK] FAISS-Index aktualisiert: +{summary['chunks_added']} / -{summary['chunks_removed']} Chunks "
+        f"({summary['added']} neu, {summary['updated']} geändert, {summary['removed']} entfernt; {stats.line()})"
     )
+    return summary
 
 
 if __name__ == "__main__":
-    build_index()
+    p = argparse.ArgumentParser()
+    p.add_argument("--full", action="store_true", help="Index komplett neu aufbauen statt inkrementell")
+    args = p.parse_args()
+    if args.full:
+        build_index()
+    else:
+        update_index()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Stored next to the FAISS files: <index_dir>/lexical/{terms,chunk_ids,meta}.json + CSR arrays as .npy
+LEXICAL_DIR = "lexical"
+_FORMAT_VERSION = 1
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# words incl. compounds such as article numbers "a-123/4" or paragraph references "12.3"
+_TOKEN = re.compile(r"\w+(?:[-./:]\w+)*")
+_PARTS = re.compile(r"[-./:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded word tokens; compound tokens are kept whole and also split into parts."""
+    out: List[str] = []
+    for tok in _TOKEN.findall(text.casefold()):
+        out.append(tok)
+        if _PARTS.search(tok):
+            out.extend(p for p in _PARTS.split(tok) if p)
+    return out
+
+
+class LexicalIndex:
+    """BM25 inverted index over the chunks of the vector index, keyed by docstore id.
+
+    Postings are kept in CSR form: for term ``t`` the chunk numbers are
+    ``postings[offsets[t]:offsets[t+1]]`` with term frequencies in ``tfs`` at the
+    same positions. Updates rebuild the arrays from (term, chunk, tf) triples, so
+    the index stays compact after removals.
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        chunk_ids: List[str],
+    ) -> None:
+        self.terms = terms
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.chunk_ids = chunk_ids
+        self._positions: Optional[Dict[str, int]] = None
+        self._avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    # -- construction -----------------------------------------------------
+
+    @classmethod
+    def _from_triples(
+        cls,
+        terms: List[str],
+        t: np.ndarray,
+        c: np.ndarray,
+        f: np.ndarray,
+        doc_len: np.ndarray,
+        chunk_ids: List[str],
+    ) -> "LexicalIndex":
+        # drop terms without postings and renumber the rest
+        used = np.unique(t)
+        remap = np.full(len(terms), -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        t = remap[t]
+        terms = [terms[i] for i in used]
+        order = np.lexsort((c, t))
+        t, c, f = t[order], c[order], f[order]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(t, minlength=len(terms)), out=offsets[1:])
+        return cls(
+            terms,
+            offsets,
+            c.astype(np.int32),
+            np.minimum(f, np.iinfo(np.uint16).max).astype(np.uint16),
+            doc_len.astype(np.int32),
+            chunk_ids,
+        )
+
+    @staticmethod
+    def _triples(
+        texts: Iterable[str], vocab: Dict[str, int], terms: List[str], first_chunk: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        rows_t: List[int] = []
+        rows_c: List[int] = []
+        rows_f: List[int] = []
+        lengths: List[int] = []
+        for n, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                tid = vocab.get(term)
+                if tid is None:
+                    tid = vocab[term] = len(terms)
+                    terms.append(term)
+                rows_t.append(tid)
+                rows_c.append(first_chunk + n)
+                rows_f.append(tf)
+        return (
+            np.asarray(rows_t, dtype=np.int64),
+            np.asarray(rows_c, dtype=np.int64),
+            np.asarray(rows_f, dtype=np.int64),
+            np.asarray(lengths, dtype=np.int32),
+        )
+
+    @classmethod
+    def build(cls, chunk_ids: Sequence[str], texts: Iterable[str]) -> "LexicalIndex":
+        terms: List[str] = []
+        t, c, f, lengths = cls._triples(texts, {}, terms, 0)
+        return cls._from_triples(terms, t, c, f, lengths, list(chunk_ids))
+
+    def _expanded(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        t = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+        return t, np.asarray(self.postings, dtype=np.int64), np.asarray(self.tfs, dtype=np.int64)
+
+    def updated(
+        self, *, remove: Iterable[str] = (), add_ids: Sequence[str] = (), add_texts: Iterable[str] = ()
+    ) -> "LexicalIndex":
+        """New index without the chunks in ``remove`` and with the given chunks added."""
+        t, c, f = self._expanded()
+        doc_len = np.asarray(self.doc_len)
+        chunk_ids = list(self.chunk_ids)
+        drop = set(remove)
+        if drop:
+            keep = np.asarray([cid not in drop for cid in chunk_ids], dtype=bool)
+            remap = np.cumsum(keep) - 1
+            mask = keep[c]
+            t, c, f = t[mask], remap[c[mask]], f[mask]
+            doc_len = doc_len[keep]
+            chunk_ids = [cid for cid, k in zip(chunk_ids, keep) if k]
+        terms = list(self.terms)
+        vocab = dict(self.vocab)
+        nt, nc, nf, lengths = self._triples(add_texts, vocab, terms, len(chunk_ids))
+        return self._from_triples(
+            terms,
+            np.concatenate([t, nt]),
+            np.concatenate([c, nc]),
+            np.concatenate([f, nf]),
+            np.concatenate([doc_len, lengths]),
+            chunk_ids + list(add_ids),
+        )
+
+    # -- persistence ------------------------------------------------------
+
+    def save(self, index_dir: Path) -> None:
+        """Write to ``index_dir/lexical`` via a temporary directory swapped in place."""
+        target = index_dir / LEXICAL_DIR
+        tmp = index_dir / (LEXICAL_DIR + ".tmp")
+        old = index_dir / (LEXICAL_DIR + ".old")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "offsets.npy", np.asarray(self.offsets))
+        np.save(tmp / "postings.npy", np.asarray(self.postings))
+        np.save(tmp / "tfs.npy", np.asarray(self.tfs))
+        np.save(tmp / "doc_len.npy", np.asarray(self.doc_len))
+        with (tmp / "terms.json").open("w", encoding="utf-8") as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+        with (tmp / "chunk_ids.json").open("w", encoding="utf-8") as f:
+            json.dump(self.chunk_ids, f)
+        with (tmp / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump({"version": _FORMAT_VERSION, "chunks": len(self), "terms": len(self.terms)}, f)
+        shutil.rmtree(old, ignore_errors=True)
+        if target.exists():
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["LexicalIndex"]:
+        """Load the index (arrays memory-mapped), or None if missing or of another format."""
+        base = index_dir / LEXICAL_DIR
+        try:
+            with (base / "meta.json").open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != _FORMAT_VERSION:
+                return None
+            with (base / "terms.json").open("r", encoding="utf-8") as f:
+                terms = json.load(f)
+            with (base / "chunk_ids.json").open("r", encoding="utf-8") as f:
+                chunk_ids = json.load(f)
+            return cls(
+                terms,
+                np.load(base / "offsets.npy", mmap_mode="r"),
+                np.load(base / "postings.npy", mmap_mode="r"),
+                np.load(base / "tfs.npy", mmap_mode="r"),
+                np.load(base / "doc_len.npy", mmap_mode="r"),
+                chunk_ids,
+            )
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # -- search -------------------------------------------------------------
+
+    def positions(self, chunk_ids: Iterable[str]) -> np.ndarray:
+        """Chunk numbers of the given docstore ids (unknown ids are skipped)."""
+        if self._positions is None:
+            self._positions = {cid: i for i, cid in enumerate(self.chunk_ids)}
+        lookup = self._positions
+        return np.asarray([lookup[i] for i in chunk_ids if i in lookup], dtype=np.int64)
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Top-k (docstore id, BM25 score), optionally restricted to chunk numbers ``allowed``."""
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            start, end = int(self.offsets[tid]), int(self.offsets[tid + 1])
+            chunks = self.postings[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[chunks] / max(self._avg_len, 1e-9))
+            # each chunk occurs at most once per term, so fancy-index += is safe
+            scores[chunks] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        if allowed is not None:
+            masked = np.zeros_like(scores)
+            masked[allowed] = scores[allowed]
+            scores = masked
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.chunk_ids[int(i)], float(scores[i])) for i in hits]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chunks": len(self),
+            "terms": len(self.terms),
+            "postings": int(len(self.postings)),
+            "array_bytes": int(
+                self.offsets.nbytes + self.postings.nbytes + self.tfs.nbytes + self.doc_len.nbytes
+            ),
+        }
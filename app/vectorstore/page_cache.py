@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from app.paths import get_docs_dir
+
+# One JSONL file per document next to the docs: a header line with the stat of
+# the source file, followed by one {"page": n, "text": ...} line per page.
+PAGES_DIR = get_docs_dir() / ".pages"
+
+
+def _cache_path(doc_id: str) -> Path:
+    return PAGES_DIR / f"{doc_id}.jsonl"
+
+
+def write_pages(doc_id: str, source: Path, texts: Iterable[str]) -> None:
+    """Persist the page texts of ``source`` for ``doc_id`` (atomic replace)."""
+    st = source.stat()
+    PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    target = _cache_path(doc_id)
+    tmp = target.with_suffix(".jsonl.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        header = {"file": source.name, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for i, text in enumerate(texts):
+            f.write(json.dumps({"page": i, "text": text}, ensure_ascii=False) + "\n")
+    os.replace(tmp, target)
+
+
+def _limit(texts: Iterable[str], max_pages: int, max_chars: Optional[int]) -> List[str]:
+    """Leading pages up to ``max_pages`` with at most ``max_chars`` characters in total (last page cut)."""
+    pages: List[str] = []
+    total = 0
+    for text in texts:
+        if len(pages) >= max_pages or (max_chars is not None and total >= max_chars):
+            break
+        if max_chars is not None:
+            text = text[: max_chars - total]
+        pages.append(text)
+        total += len(text)
+    return pages
+
+
+def read_pages(
+    doc_id: str, source: Path, *, max_pages: int = 10, max_chars: Optional[int] = None
+) -> Optional[List[str]]:
+    """Return up to ``max_pages`` cached page texts, or None if missing/stale.
+
+    At most ``max_chars`` characters are returned and reading stops there, so
+    callers that only need the beginning of a long document read just those lines.
+    """
+    try:
+        st = source.stat()
+        with _cache_path(doc_id).open("r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("mtime_ns") != st.st_mtime_ns or header.get("size") != st.st_size:
+                return None
+            # lazy: lines after the limit are never read
+            return _limit((json.loads(line).get("text", "") for line in f), max_pages, max_chars)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_pages(
+    doc_id: str, source: Path, *, max_pages: int = 10, max_chars: Optional[int] = None
+) -> List[str]:
+    """Cached page texts; parses the PDF once and fills the cache on a miss."""
+    pages = read_pages(doc_id, source, max_pages=max_pages, max_chars=max_chars)
+    if pages is not None:
+        return pages
+    from langchain_community.document_loaders import PyPDFLoader  # type: ignore
+
+    texts = [p.page_content for p in PyPDFLoader(str(source)).load()]
+    try:
+        write_pages(doc_id, source, texts)
+    except OSError:
+        logging.warning(f"Seiten-Cache für {source} konnte nicht geschrieben werden.", exc_info=True)
+    return _limit(texts, max_pages, max_chars)
+
+
+def remove_pages(doc_id: str) -> None:
+    try:
+        _cache_path(doc_id).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.telemetry import QUERY_CACHE_LOOKUPS
+
+QUERY_EMBEDDING_CACHE = os.getenv("QUERY_EMBEDDING_CACHE", "true").lower() == "true"
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+# Felder, unter denen Log-Zeilen im JSON-Format die Anfrage enthalten (/chat, /retrieve/batch)
+_LOG_FIELDS = ("query", "message", "question")
+
+
+def normalize_query(text: str) -> str:
+    # only whitespace and unicode form: case and punctuation can change the vector
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU of query vectors keyed by (model, normalized query text).
+
+    Entries expire after ``ttl_seconds`` (0 = never). Vectors are kept as float32,
+    the precision FAISS searches with, so a hit returns what the search would
+    have used anyway.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "prewarmed": 0}
+
+    def _get(self, key: Tuple[str, str], now: float) -> Optional[np.ndarray]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        created, vec = item
+        if self.ttl > 0 and now - created > self.ttl:
+            del self._entries[key]
+            self._counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return vec
+
+    def _put(self, key: Tuple[str, str], vector: Sequence[float], now: float) -> None:
+        self._entries[key] = (now, np.asarray(vector, dtype=np.float32))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def embed(
+        self, model: str, texts: Sequence[str], embed: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Vectors for ``texts``; only queries not in the cache are passed to ``embed`` (once each)."""
+        norms = [normalize_query(t) for t in texts]
+        now = time.monotonic()
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for norm in norms:
+                if norm not in found:
+                    vec = self._get((model, norm), now)
+                    if vec is not None:
+                        found[norm] = vec
+            hits = sum(1 for norm in norms if norm in found)
+            self._counters["hits"] += hits
+            self._counters["misses"] += len(norms) - hits
+        if hits:
+            QUERY_CACHE_LOOKUPS.inc(hits, result="hit")
+        if len(norms) > hits:
+            QUERY_CACHE_LOOKUPS.inc(len(norms) - hits, result="miss")
+        todo = list(dict.fromkeys(norm for norm in norms if norm not in found))
+        if todo:
+            vectors = embed(todo)
+            with self._lock:
+                now = time.monotonic()
+                for norm, vec in zip(todo, vectors):
+                    self._put((model, norm), vec, now)
+                    found[norm] = self._entries[(model, norm)][1]
+        return [found[norm].tolist() for norm in norms]
+
+    def prewarm(
+        self, model: str, queries: Sequence[str], embed: Callable[[List[str]], List[List[float]]]
+    ) -> int:
+        """Embed ``queries`` that are not cached yet (without counting lookups); returns how many were added."""
+        now = time.monotonic()
+        with self._lock:
+            todo = list(dict.fromkeys(n for n in map(normalize_query, queries) if n and self._get((model, n), now) is None))
+        if not todo:
+            return 0
+        vectors = embed(todo)
+        with self._lock:
+            now = time.monotonic()
+            for norm, vec in zip(todo, vectors):
+                self._put((model, norm), vec, now)
+            self._counters["prewarmed"] += len(todo)
+        return len(todo)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["entries"] = len(self._entries)
+        total = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / total, 4) if total else None
+        out["max_entries"] = self.max_entries
+        out["ttl_seconds"] = self.ttl
+        out["enabled"] = QUERY_EMBEDDING_CACHE
+        return out
+
+
+def read_query_log(path: Path, limit: int) -> List[str]:
+    """The ``limit`` most frequent queries of a log file, most frequent first.
+
+    Lines are either plain query text or JSON objects with a ``query``,
+    ``message`` or ``question`` field; other lines are skipped.
+    """
+    counts: Counter[str] = Counter()
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            text: Any = line
+            if line.startswith("{"):
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                text = next((data[k] for k in _LOG_FIELDS if isinstance(data.get(k), str)), None)
+            norm = normalize_query(text) if isinstance(text, str) else ""
+            if norm:
+                counts[norm] += 1
+    logging.debug(f"Query-Log {path}: {len(counts)} verschiedene Anfragen")
+    return [q for q, _ in counts.most_common(limit)]
+
+
+query_cache = QueryEmbeddingCache(
+    max_entries=QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=QUERY_EMBEDDING_CACHE_TTL,
+)
@@ -1,43 +1,585 @@
 from __future__ import annotations
 
+import json
+import logging
 import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
 from app.paths import get_index_dir
 
 
-from app.vectorstore.embeddings import (
-    build_hf_embeddings,
-    build_openai_embeddings,
+from app.vectorstore.embeddings import get_embeddings
+from app.vectorstore.lexical import LexicalIndex
+from app.vectorstore.query_cache import QUERY_EMBEDDING_CACHE, query_cache, read_query_log
+from app.telemetry import span
+from app.vectorstore.serving import DOCSTORE_NAME, SqliteDocstore, load_serving_store
+from app.vectorstore.generations import current_dir
+from app.vectorstore.index_factory import (
+    FAISS_EXACT_SUBSET,
+    index_type_of,
+    prepare_for_search,
+    read_meta,
+    search_parameters,
 )
 
 def _env(key: str, default: str) -> str:
     return os.getenv(key, default)
 
 
-def _embedding() -> Embeddings:
+def _embedding_key() -> Tuple[str, str]:
     provider = _env("EMBEDDINGS_PROVIDER", "huggingface").lower()
     if provider == "openai":
         model = _env("EMBEDDING_MODEL", "text-embedding-3-small")
-        return build_openai_embeddings(model=model)
     else:
         model = _env("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        return build_hf_embeddings(model=model)
+    return provider, model
+
+
+def _embedding() -> Embeddings:
+    provider, model = _embedding_key()
+    return get_embeddings(provider=provider, model=model)
+
+
+# dense | bm25 | hybrid (dense + BM25 via reciprocal rank fusion)
+RETRIEVAL_MODE = _env("RETRIEVAL_MODE", "dense").lower()
+# Kandidaten je Verfahren für die Fusion (mindestens k) und RRF-Konstante
+HYBRID_CANDIDATES = int(_env("HYBRID_CANDIDATES", "20"))
+RRF_K = int(_env("RRF_K", "60"))
+
+_INDEX_FILES = ("index.faiss", "index.pkl")
+
+
+def _index_stamp(index_dir: Path) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """(mtime_ns, size) of the persisted index files, or None if the index is missing."""
+    stamp = []
+    for name in _INDEX_FILES:
+        try:
+            st = (index_dir / name).stat()
+        except FileNotFoundError:
+            return None
+        stamp.append((st.st_mtime_ns, st.st_size))
+    try:
+        st = (index_dir / DOCSTORE_NAME).stat()
+        stamp.append((st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        stamp.append((0, 0))
+    return tuple(stamp)
+
+
+def _read_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with (index_dir / "manifest.json").open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class IndexSnapshot:
+    """One loaded index generation plus its metadata index.
+
+    ``positions_for_doc`` / ``positions_for_source`` resolve a document to its FAISS
+    vector positions, so doc-scoped queries can be restricted inside the FAISS
+    search instead of filtering a global top-k. With the SQLite serving docstore
+    these are indexed lookups; for a pickled docstore the maps are built from a
+    scan on first use.
+    """
+
+    def __init__(
+        self, vs: FAISS, generation: int, manifest: Optional[Dict[str, Any]] = None, index_dir: Optional[Path] = None
+    ) -> None:
+        self.vs = vs
+        self.generation = generation
+        self.index_dir = index_dir
+        self._lexical: Optional[LexicalIndex] = None
+        self._lexical_loaded = False
+        self._lexical_lock = threading.Lock()
+        # doc_id -> content hash of the indexed file (changes only when that document is reindexed)
+        self.doc_versions: Dict[str, str] = {
+            str(e["doc_id"]): str(e.get("sha256"))
+            for e in ((manifest or {}).get("files") or {}).values()
+            if isinstance(e, dict) and e.get("doc_id")
+        }
+        self._maps: Optional[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]] = None
+        self._sources: Optional[List[str]] = None
+
+    @property
+    def _sqlite(self) -> Optional[SqliteDocstore]:
+        store = self.vs.docstore
+        return store if isinstance(store, SqliteDocstore) else None
+
+    def _scan_maps(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        if self._maps is None:
+            by_doc: Dict[str, List[int]] = {}
+            by_source: Dict[str, List[int]] = {}
+            for pos, _id in self.vs.index_to_docstore_id.items():
+                doc = self.vs.docstore.search(_id)
+                meta = getattr(doc, "metadata", None) or {}
+                doc_id = meta.get("doc_id")
+                if doc_id:
+                    by_doc.setdefault(str(doc_id), []).append(pos)
+                src = meta.get("source") or meta.get("file_path") or meta.get("file_name")
+                if src:
+                    by_source.setdefault(str(src), []).append(pos)
+            self._maps = (
+                {k: np.asarray(v, dtype=np.int64) for k, v in by_doc.items()},
+                {k: np.asarray(v, dtype=np.int64) for k, v in by_source.items()},
+            )
+        return self._maps
+
+    def positions_for_doc(self, doc_id: str) -> Optional[np.ndarray]:
+        store = self._sqlite
+        if store is not None:
+            return store.positions("doc_id", doc_id)
+        return self._scan_maps()[0].get(doc_id)
+
+    def document_count(self) -> int:
+        store = self._sqlite
+        if store is not None:
+            return len(store.distinct("doc_id"))
+        return len(self._scan_maps()[0])
+
+    def positions_for_source(self, source: str, exact: bool = False) -> Optional[np.ndarray]:
+        store = self._sqlite
+        if store is not None:
+            if self._sources is None:
+                self._sources = store.distinct("source")
+            keys = self._sources
+        else:
+            keys = list(self._scan_maps()[1])
+        src_lower = source.lower()
+        hits = []
+        for key in keys:
+            key_lower = key.lower()
+            base = os.path.basename(key_lower)
+            if exact:
+                ok = base == src_lower or key_lower == src_lower
+            else:
+                ok = src_lower in key_lower or src_lower in base
+            if ok:
+                positions = store.positions("source", key) if store is not None else self._scan_maps()[1][key]
+                if positions is not None:
+                    hits.append(positions)
+        if not hits:
+            return None
+        return np.unique(np.concatenate(hits))
+
+    def ids_at(self, positions: np.ndarray) -> List[str]:
+        store = self._sqlite
+        if store is not None:
+            return list(store.ids_at(positions).values())
+        mapping = self.vs.index_to_docstore_id
+        return [mapping[int(p)] for p in positions]
+
+    @property
+    def lexical(self) -> Optional[LexicalIndex]:
+        """BM25 index of this generation, loaded on first use (None if not built)."""
+        if not self._lexical_loaded:
+            with self._lexical_lock:
+                if not self._lexical_loaded:
+                    self._lexical = LexicalIndex.load(self.index_dir) if self.index_dir else None
+                    self._lexical_loaded = True
+        return self._lexical
+
+    def search_ids(
+        self, vector: List[float], k: int, positions: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """Dense top-k as (docstore id, FAISS score)."""
+        return self.search_ids_batch(np.asarray([vector], dtype=np.float32), k, positions)[0]
+
+    def search_ids_batch(
+        self, vectors: np.ndarray, k: int, positions: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Dense top-k for each row of ``vectors`` with a single FAISS search over the query matrix."""
+        import faiss
+
+        vs = self.vs
+        q = np.array(vectors, dtype=np.float32, order="C")  # copy: normalize_L2 works in place
+        if getattr(vs, "_normalize_L2", False):
+            faiss.normalize_L2(q)
+        if positions is None:
+            scores, ids = vs.index.search(q, k)
+        else:
+            k = min(k, len(positions))
+            if k <= 0:
+                return [[] for _ in range(len(q))]
+            approximate = index_type_of(vs.index) != "flat"
+            if approximate and len(positions) <= FAISS_EXACT_SUBSET:
+                # small filters: an exact scan beats probing IVF lists / HNSW graph with a selector
+                scores, ids = _subset_search(vs.index, q, positions, k)
+            else:
+                try:
+                    params = search_parameters(vs.index, faiss.IDSelectorBatch(positions))
+                    scores, ids = vs.index.search(q, k, params=params)
+                except (AttributeError, TypeError, RuntimeError):
+                    # index type without selector support: exact scan over the subset
+                    scores, ids = _subset_search(vs.index, q, positions, k)
+        return [
+            [(vs.index_to_docstore_id[int(pos)], float(score)) for score, pos in zip(row_scores, row_ids) if pos != -1]
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+
+    def lexical_ids(self, query: str, k: int, positions: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """BM25 top-k as (docstore id, score); empty if no lexical index exists."""
+        lexical = self.lexical
+        if lexical is None:
+            return []
+        allowed = None
+        if positions is not None:
+            allowed = lexical.positions(self.ids_at(positions))
+        return lexical.search(query, k, allowed)
+
+    def documents(self, hits: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        out: List[Tuple[Document, float]] = []
+        for _id, score in hits:
+            doc = self.vs.docstore.search(_id)
+            if isinstance(doc, Document):
+                out.append((doc, score))
+        return out
+
+    def search_by_vector(
+        self, vector: List[float], k: int, positions: Optional[np.ndarray] = None
+    ) -> List[Tuple[Document, float]]:
+        return self.documents(self.search_ids(vector, k, positions))
+
+
+def _rrf(*rankings: List[Tuple[str, float]], k: int) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: sum of 1 / (RRF_K + rank) over all rankings."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (_id, _) in enumerate(ranking, 1):
+            fused[_id] = fused.get(_id, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+
+def _subset_search(index, q: np.ndarray, positions: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    import faiss
+
+    xb = index.reconstruct_batch(positions)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        dist = -(q @ xb.T)
+    else:
+        # |q - x|^2 for all (query, vector) pairs without materializing the differences
+        dist = (q * q).sum(axis=1)[:, None] - 2.0 * (q @ xb.T) + (xb * xb).sum(axis=1)[None, :]
+    order = np.argsort(dist, axis=1)[:, :k]
+    dist = np.take_along_axis(dist, order, axis=1)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        dist = -dist
+    return dist, positions[order]
+
 
+class ResidentVectorStore:
+    """Long-lived, thread-safe handle on the persisted FAISS index.
 
+    The index is deserialized once and kept in memory. Every access compares the
+    on-disk stamp of the index files; when they changed (new ingest), a fresh
+    store is loaded and swapped in atomically. Callers that still hold the old
+    store keep using it until they are done.
+    """
 
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snap: Optional[IndexSnapshot] = None
+        self._stamp: Optional[Tuple[Tuple[int, int], ...]] = None
+        self._index_dir: Optional[Path] = None
+        self._generation = 0
+        self._stats: Dict[str, Any] = {
+            "loads": 0,
+            "load_errors": 0,
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+        }
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self) -> VectorStore:
+        return self.snapshot().vs
+
+    def snapshot(self) -> IndexSnapshot:
+        backend = _env("VECTORSTORE_BACKEND", "faiss").lower()
+        if backend != "faiss":
+            raise ValueError(f"Unbekannter VECTORSTORE_BACKEND '{backend}'. Erlaubt: faiss")
+
+        root = get_index_dir()
+        # published generations are immutable; the stamp still covers the legacy in-place layout
+        index_dir = current_dir(root)
+        stamp = _index_stamp(index_dir) if index_dir is not None else None
+        if index_dir is None or stamp is None:
+            raise FileNotFoundError(f"Kein FAISS-Index unter {root}")
+        snap = self._snap
+        if snap is not None and stamp == self._stamp and index_dir == self._index_dir:
+            return snap
+
+        with self._lock:
+            # another thread may have reloaded while we waited
+            if self._snap is not None and stamp == self._stamp and index_dir == self._index_dir:
+                return self._snap
+            t0 = time.perf_counter()
+            try:
+                with span("index", "load"):
+                    fresh = load_serving_store(index_dir, _embedding()) or FAISS.load_local(
+                        str(index_dir), _embedding(), allow_dangerous_deserialization=True
+                    )
+                prepare_for_search(fresh.index)
+                snap = IndexSnapshot(fresh, self._generation + 1, _read_manifest(index_dir), index_dir)
+            except Exception:
+                self._stats["load_errors"] += 1
+                if self._snap is not None:
+                    # e.g. index files caught mid-write: keep serving the previous generation
+                    logging.warning("FAISS-Index konnte nicht neu geladen werden, nutze vorherigen Stand.", exc_info=True)
+                    return self._snap
+                raise
+            elapsed = time.perf_counter() - t0
+            self._snap, self._stamp, self._index_dir = snap, stamp, index_dir
+            self._generation = snap.generation
+            self._stats["loads"] += 1
+            self._stats["last_load_seconds"] = elapsed
+            self._stats["total_load_seconds"] += elapsed
+            logging.info(
+                f"FAISS-Index geladen (Generation {self._generation}, {fresh.index.ntotal} Vektoren, {elapsed:.3f}s)"
+            )
+            return snap
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snap = None
+            self._stamp = None
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snap
+        out: Dict[str, Any] = dict(self._stats)
+        out["generation"] = self._generation
+        out["loaded"] = snap is not None
+        if snap is not None:
+            vs = snap.vs
+            out["documents"] = snap.document_count()
+            ntotal = int(vs.index.ntotal)
+            dim = int(vs.index.d)
+            out["vectors"] = ntotal
+            out["dimension"] = dim
+            out["vector_bytes"] = ntotal * dim * 4
+            out["index_layout"] = (read_meta(self._index_dir) if self._index_dir else None) or {
+                "type": index_type_of(vs.index)
+            }
+            out["docstore_entries"] = len(vs.index_to_docstore_id)
+            out["serving_format"] = "mmap" if snap._sqlite is not None else "pickle"
+            lexical = snap._lexical
+            out["lexical"] = lexical.stats() if lexical is not None else None
+        if self._index_dir is not None:
+            out["index_dir"] = str(self._index_dir)
+            out["index_file_bytes"] = sum(
+                (self._index_dir / n).stat().st_size
+                for n in _INDEX_FILES + (DOCSTORE_NAME,)
+                if (self._index_dir / n).exists()
+            )
+        out["peak_rss_bytes"] = _peak_rss_bytes()
+        return out
+
+
+_RESIDENT = ResidentVectorStore()
 
 
 def load_vectorstore() -> VectorStore:
+    return _RESIDENT.get()
+
+
+def vectorstore_stats() -> Dict[str, Any]:
+    return _RESIDENT.stats()
+
+
+def index_version(doc_id: str | None = None) -> str | None:
+    """Version of the indexed content: per document (content hash) or, without doc_id, the whole index.
+
+    Returns None if no index exists.
+    """
+    try:
+        snap = _RESIDENT.snapshot()
+    except FileNotFoundError:
+        return None
+    if doc_id and doc_id in snap.doc_versions:
+        return f"doc:{snap.doc_versions[doc_id]}"
+    return f"gen:{snap.generation}"
+
+
+def search_with_scores(
+    query: str,
+    k: int = 4,
+    *,
+    doc_id: str | None = None,
+    source: str | None = None,
+    source_exact: bool = False,
+    mode: str | None = None,
+) -> List[Tuple[Document, float]]:
+    """Top-k search, restricted inside FAISS to a document when doc_id/source are given.
+
+    doc_id takes precedence; if the index has no vectors for it, ``source`` is used
+    as fallback. Returns an empty list when the restriction matches nothing.
+    ``mode`` (default RETRIEVAL_MODE) selects dense, bm25 or hybrid retrieval;
+    scores are FAISS distances, BM25 scores or RRF scores respectively. Without a
+    lexical index, bm25/hybrid fall back to dense.
+    Raises FileNotFoundError if no index exists.
+    """
+    snap = _RESIDENT.snapshot()
+    positions: Optional[np.ndarray] = None
+    if doc_id:
+        positions = snap.positions_for_doc(doc_id)
+        if positions is None and source:
+            positions = snap.positions_for_source(source, source_exact)
+        if positions is None:
+            return []
+    elif source:
+        positions = snap.positions_for_source(source, source_exact)
+        if positions is None:
+            return []
+    mode = (mode or RETRIEVAL_MODE).lower()
+    with span("retrieval", mode, k=k, filtered=positions is not None):
+        if mode in ("bm25", "hybrid") and snap.lexical is not None:
+            n = max(k, HYBRID_CANDIDATES)
+            lexical = snap.lexical_ids(query, n if mode == "hybrid" else k, positions)
+            if mode == "bm25":
+                return snap.documents(lexical)
+            dense = snap.search_ids(_embed_query(snap, query), n, positions)
+            return snap.documents(_rrf(dense, lexical, k=k))
+        return snap.search_by_vector(_embed_query(snap, query), k, positions)
+
+
+def _embed_texts(emb: Embeddings, texts: List[str]) -> List[List[float]]:
+    # embed_documents batches the API calls / forward passes; the configured providers
+    # encode queries and documents the same way
+    if len(texts) == 1:
+        return [emb.embed_query(texts[0])]
+    return emb.embed_documents(texts)
+
+
+def _query_vectors(emb: Embeddings, texts: List[str]) -> List[List[float]]:
+    if not QUERY_EMBEDDING_CACHE:
+        return _embed_texts(emb, texts)
+    provider, model = _embedding_key()
+    return query_cache.embed(f"{provider}:{model}", texts, lambda todo: _embed_texts(emb, todo))
+
+
+def embed_query(text: str) -> List[float]:
+    """Vector of a user query with the configured embedding model, served from the query cache on repeats."""
+    with span("embedding", "query"):
+        return _query_vectors(_embedding(), [text])[0]
+
+
+def _embed_query(snap: IndexSnapshot, query: str) -> List[float]:
+    with span("embedding", "query"):
+        return _query_vectors(snap.vs.embedding_function, [query])[0]
+
+
+def _embed_queries(snap: IndexSnapshot, queries: List[str]) -> np.ndarray:
+    with span("embedding", "query_batch", texts=len(queries)):
+        return np.asarray(_query_vectors(snap.vs.embedding_function, queries), dtype=np.float32)
+
+
+def prewarm_query_cache(path: str | Path, limit: int = 1000) -> int:
+    """Embed the most frequent queries of a query log ahead of time; returns the number of new cache entries."""
+    queries = read_query_log(Path(path), limit)
+    if not queries or not QUERY_EMBEDDING_CACHE:
+        return 0
+    provider, model = _embedding_key()
     emb = _embedding()
-    backend = _env("VECTORSTORE_BACKEND", "faiss").lower()
+    with span("embedding", "prewarm", texts=len(queries)):
+        return query_cache.prewarm(f"{provider}:{model}", queries, lambda todo: _embed_texts(emb, todo))
+
+
+def query_cache_stats() -> Dict[str, Any]:
+    return query_cache.stats()
+
+
+def search_batch(
+    queries: Sequence[str],
+    k: int = 4,
+    *,
+    doc_ids: Optional[Sequence[Optional[str]]] = None,
+    mode: str | None = None,
+) -> List[List[Tuple[Document, float]]]:
+    """Top-k for many queries at once, e.g. for evaluation sweeps.
+
+    All queries are embedded in batched calls and searched with one FAISS call
+    per filter group (all unfiltered queries together, and one call per distinct
+    ``doc_ids`` entry). BM25 (for bm25/hybrid) still runs per query. Results and
+    scores are the same as :func:`search_with_scores` for each query; a doc_id
+    without vectors in the index yields an empty list.
+    Raises FileNotFoundError if no index exists.
+    """
+    if doc_ids is not None and len(doc_ids) != len(queries):
+        raise ValueError("doc_ids muss genauso lang sein wie queries")
+    results: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+    if not queries:
+        return results
+    snap = _RESIDENT.snapshot()
+    mode = (mode or RETRIEVAL_MODE).lower()
+    lexical = snap.lexical if mode in ("bm25", "hybrid") else None
+    n = max(k, HYBRID_CANDIDATES) if lexical is not None and mode == "hybrid" else k
+
+    groups: Dict[Optional[str], List[int]] = {}
+    for i in range(len(queries)):
+        groups.setdefault((doc_ids[i] or None) if doc_ids is not None else None, []).append(i)
+    positions = {d: snap.positions_for_doc(d) if d else None for d in groups}
+    # Filter ohne Vektoren im Index: leeres Ergebnis, wie bei search_with_scores
+    groups = {d: idx for d, idx in groups.items() if d is None or positions[d] is not None}
+    active = sorted(i for idx in groups.values() for i in idx)
+    if not active:
+        return results
+
+    with span("retrieval", f"batch_{mode}", k=k, queries=len(active)):
+        dense: Dict[int, List[Tuple[str, float]]] = {}
+        if not (mode == "bm25" and lexical is not None):
+            vectors = _embed_queries(snap, [queries[i] for i in active])
+            row = {i: r for r, i in enumerate(active)}
+            for d, idx in groups.items():
+                hits = snap.search_ids_batch(vectors[[row[i] for i in idx]], n, positions[d])
+                dense.update(zip(idx, hits))
+        for d, idx in groups.items():
+            for i in idx:
+                if lexical is None:
+                    ranked = dense[i]
+                elif mode == "bm25":
+                    ranked = snap.lexical_ids(queries[i], k, positions[d])
+                else:
+                    ranked = _rrf(dense[i], snap.lexical_ids(queries[i], n, positions[d]), k=k)
+                results[i] = snap.documents(ranked)
+    return results
+
+
+def search(
+    query: str,
+    k: int = 4,
+    *,
+    doc_id: str | None = None,
+    source: str | None = None,
+    source_exact: bool = False,
+    mode: str | None = None,
+) -> List[Document]:
+    return [
+        d
+        for d, _ in search_with_scores(query, k, doc_id=doc_id, source=source, source_exact=source_exact, mode=mode)
+    ]
 
-    if backend == "faiss":
-        index_dir = str(get_index_dir())
-        return FAISS.load_local(index_dir, emb, allow_dangerous_deserialization=True)
-    
 
 def get_retriever(k: int = 4):
     try:
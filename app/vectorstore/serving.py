@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Read-only serving format next to index.faiss/index.pkl: one SQLite file with the
+# chunk texts, metadata and FAISS positions. Worker processes open it (and the
+# FAISS index) memory-mapped, so they share the OS page cache instead of each
+# unpickling a private copy.
+DOCSTORE_NAME = "docstore.sqlite"
+SERVING_FORMAT = os.getenv("SERVING_FORMAT", "mmap").lower()  # mmap | pickle
+_MMAP_SIZE = 1 << 34  # upper bound; SQLite maps at most the file size
+_COLUMNS = ("doc_id", "source")
+
+_SCHEMA = """
+CREATE TABLE chunks (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    doc_id TEXT,
+    source TEXT
+);
+CREATE INDEX chunks_doc_id ON chunks (doc_id);
+CREATE INDEX chunks_source ON chunks (source);
+"""
+
+
+def write_docstore(vs: FAISS, index_dir: Path) -> None:
+    """Write the serving docstore for ``vs`` (temp file + atomic replace)."""
+    target = index_dir / DOCSTORE_NAME
+    tmp = index_dir / (DOCSTORE_NAME + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + _SCHEMA)
+
+        def rows() -> Iterator[tuple]:
+            for pos, _id in vs.index_to_docstore_id.items():
+                doc = vs.docstore.search(_id)
+                if not isinstance(doc, Document):
+                    continue
+                meta = doc.metadata or {}
+                src = meta.get("source") or meta.get("file_path") or meta.get("file_name")
+                yield (
+                    int(pos),
+                    _id,
+                    doc.page_content,
+                    json.dumps(meta, ensure_ascii=False, default=str),
+                    str(meta["doc_id"]) if meta.get("doc_id") else None,
+                    str(src) if src else None,
+                )
+
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", rows())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, target)
+
+
+class SqliteDocstore(Docstore):
+    """Read-only docstore over ``docstore.sqlite`` with one connection per thread.
+
+    The file is never modified after it was published (updates replace it), so
+    it is opened ``immutable`` and memory-mapped.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._count: Optional[int] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._conn().execute("SELECT text, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def id_at(self, pos: int) -> Optional[str]:
+        row = self._conn().execute("SELECT id FROM chunks WHERE pos = ?", (pos,)).fetchone()
+        return row[0] if row else None
+
+    def ids_at(self, positions: Iterable[int]) -> Dict[int, str]:
+        out: Dict[int, str] = {}
+        positions = [int(p) for p in positions]
+        conn = self._conn()
+        for start in range(0, len(positions), 900):
+            part = positions[start : start + 900]
+            marks = ",".join("?" * len(part))
+            out.update(conn.execute(f"SELECT pos, id FROM chunks WHERE pos IN ({marks})", part).fetchall())
+        return out
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = int(self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+        return self._count
+
+    def iter_ids(self) -> Iterator[tuple]:
+        yield from self._conn().execute("SELECT pos, id FROM chunks ORDER BY pos")
+
+    def positions(self, column: str, value: str) -> Optional[np.ndarray]:
+        if column not in _COLUMNS:
+            raise ValueError(column)
+        rows = self._conn().execute(f"SELECT pos FROM chunks WHERE {column} = ? ORDER BY pos", (value,)).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)) if rows else None
+
+    def distinct(self, column: str) -> List[str]:
+        if column not in _COLUMNS:
+            raise ValueError(column)
+        return [r[0] for r in self._conn().execute(f"SELECT DISTINCT {column} FROM chunks WHERE {column} IS NOT NULL")]
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("SqliteDocstore ist schreibgeschützt.")
+
+
+class PositionMap(Mapping):
+    """Lazy FAISS position -> docstore id mapping backed by the SQLite docstore."""
+
+    def __init__(self, store: SqliteDocstore) -> None:
+        self.store = store
+
+    def __getitem__(self, pos: int) -> str:
+        _id = self.store.id_at(int(pos))
+        if _id is None:
+            raise KeyError(pos)
+        return _id
+
+    def __len__(self) -> int:
+        return self.store.count()
+
+    def __iter__(self) -> Iterator[int]:
+        return (pos for pos, _ in self.store.iter_ids())
+
+    def items(self):  # type: ignore[override]
+        return list(self.store.iter_ids())
+
+    def values(self):  # type: ignore[override]
+        return [i for _, i in self.store.iter_ids()]
+
+
+def _read_index(path: Path):
+    import faiss
+
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # index type / faiss build without mmap support
+        logging.info("FAISS-Index ohne mmap geladen.", exc_info=True)
+        return faiss.read_index(str(path))
+
+
+def load_serving_store(index_dir: Path, embedding: Embeddings) -> Optional[FAISS]:
+    """Memory-mapped read-only FAISS store, or None if disabled or not built yet."""
+    if SERVING_FORMAT != "mmap" or not (index_dir / DOCSTORE_NAME).exists():
+        return None
+    store = SqliteDocstore(index_dir / DOCSTORE_NAME)
+    return FAISS(
+        embedding_function=embedding,
+        index=_read_index(index_dir / "index.faiss"),
+        docstore=store,
+        index_to_docstore_id=PositionMap(store),  # type: ignore[arg-type]
+    )
@@ -0,0 +1,9 @@
+"""Offline benchmarks for the RAG pipeline.
+
+Runs against a fake chat model and hash-based embeddings, so the numbers are
+this project's own overhead (ingest, FAISS/BM25 retrieval, graph, API), not
+provider latency. Usage::
+
+    python -m benchmarks --sizes 1000,10000 --output before.json
+    python -m benchmarks --sizes 1000,10000 --baseline before.json
+"""
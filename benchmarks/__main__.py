@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+_SCENARIOS = ("build", "retrieve", "graph", "chat")
+_FAKE_EMBEDDING_MODEL = "hash-384"
+
+
+def _configure(workdir: Path, args: argparse.Namespace) -> Dict[str, str]:
+    """Environment for an isolated offline run; must be set before app modules are imported."""
+    env = {
+        "DOCS_DIR": str(workdir / "docs"),
+        "INDEX_DIR": str(workdir / "index"),
+        "EMBEDDINGS_PROVIDER": "fake",
+        "HF_EMBEDDING_MODEL": _FAKE_EMBEDDING_MODEL,
+        "EMBEDDING_CACHE": "false",
+        "EMBEDDING_CACHE_DIR": str(workdir / "embedding_cache"),
+        "CHECKPOINTER_BACKEND": "memory",
+        "ROUTER_MODE": "llm",
+        "ENABLE_WEBSEARCH": "false",
+        "ANSWER_CACHE": "true" if args.answer_cache else "false",
+        "QUERY_EMBEDDING_CACHE": "true" if args.query_cache else "false",
+        # tiktoken lädt seine BPE-Dateien beim ersten Aufruf herunter
+        "CONTEXT_WINDOW": "true" if args.context_window else "false",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-offline-benchmark"),
+    }
+    os.environ.update(env)
+    return env
+
+
+def _install_fakes(llm_latency: float) -> None:
+    from app.models.llm import set_model_factory
+    from app.vectorstore.embeddings import register_embeddings
+
+    from benchmarks.fakes import FakeChatModel, HashEmbeddings
+
+    register_embeddings(provider="fake", model=_FAKE_EMBEDDING_MODEL, embeddings=HashEmbeddings())
+    set_model_factory(lambda model, temperature: FakeChatModel(model=model, latency=llm_latency))
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _flatten(data: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, float(data)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """Print latency/throughput changes against a baseline run; returns the number of regressions."""
+    old = dict(_flatten(baseline.get("results", {})))
+    regressions = 0
+    for key, value in _flatten(current.get("results", {})):
+        if key not in old or not old[key]:
+            continue
+        if key.endswith(("_ms", ".seconds")):
+            worse = value > old[key] * (1 + threshold)
+        elif key.endswith("_per_s"):
+            worse = value < old[key] * (1 - threshold)
+        else:
+            continue
+        change = (value - old[key]) / old[key] * 100
+        flag = "  <-- REGRESSION" if worse else ""
+        regressions += int(worse)
+        print(f"{key:60s} {old[key]:12.3f} -> {value:12.3f} ({change:+.1f}%){flag}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline-Benchmarks (Fake-LLM, Hash-Embeddings)")
+    parser.add_argument("--scenarios", default=",".join(_SCENARIOS), help=f"Kommagetrennt aus {', '.join(_SCENARIOS)}")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Chunks je synthetischem Korpus")
+    parser.add_argument("--iterations", type=int, default=50, help="Wiederholungen für retrieve/graph")
+    parser.add_argument("--requests", type=int, default=200, help="Anzahl /chat-Anfragen")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallele /chat-Anfragen")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulierte LLM-Latenz je Aufruf (Sekunden)")
+    parser.add_argument("--answer-cache", action="store_true", help="Antwort-Cache aktiv lassen")
+    parser.add_argument("--query-cache", action="store_true", help="Query-Embedding-Cache aktiv lassen")
+    parser.add_argument("--context-window", action="store_true", help="Kontext-Verdichtung aktiv lassen (benötigt tiktoken-Dateien)")
+    parser.add_argument("--workdir", help="Arbeitsverzeichnis (Standard: temporär, wird gelöscht)")
+    parser.add_argument("--output", help="JSON-Ergebnisdatei (Standard: artifacts/benchmarks/bench-<Zeit>.json)")
+    parser.add_argument("--baseline", help="Früheres Ergebnis zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Toleranz für Regressionen (Anteil)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(_SCENARIOS)
+    if unknown:
+        parser.error(f"Unbekannte Szenarien: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if not {"build", "retrieve"} & set(scenarios):
+        sizes = sizes[:1]  # graph/chat brauchen nur einen Index
+
+    tmp = None if args.workdir else tempfile.TemporaryDirectory(prefix="rag-bench-")
+    workdir = Path(args.workdir or tmp.name).resolve()  # type: ignore[union-attr]
+    env = _configure(workdir, args)
+    _install_fakes(args.llm_latency)
+
+    from benchmarks import scenarios as sc
+
+    results: Dict[str, Any] = {}
+    started = time.time()
+    try:
+        for size in sizes:
+            print(f"[INFO] Korpus mit {size} Chunks wird indiziert …", flush=True)
+            build = sc.bench_build(Path(env["DOCS_DIR"]), Path(env["INDEX_DIR"]), size)
+            if "build" in scenarios:
+                results.setdefault("build", {})[str(size)] = build
+            if "retrieve" in scenarios:
+                print(f"[INFO] retrieve_tool ({size} Chunks) …", flush=True)
+                results.setdefault("retrieve", {})[str(size)] = sc.bench_retrieve(args.iterations)
+        if "graph" in scenarios:
+            print("[INFO] graph.invoke je Route …", flush=True)
+            results["graph"] = sc.bench_graph(args.iterations)
+            results["graph"]["index_chunks"] = sizes[-1]
+        if "chat" in scenarios:
+            print(f"[INFO] /chat mit {args.concurrency} parallelen Anfragen …", flush=True)
+            results["chat"] = sc.bench_chat(args.requests, args.concurrency)
+            results["chat"]["index_chunks"] = sizes[-1]
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "seconds": round(time.time() - started, 3),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else _ROOT / "artifacts" / "benchmarks" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] Ergebnisse gespeichert unter: {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"[WARN] {regressions} Regression(en) über {args.threshold:.0%} gegenüber {args.baseline}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, get_args, get_origin
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage, convert_to_messages
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=200_000)
+def _slot(word: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(word.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings (signed feature hashing, L2-normalized).
+
+    Texts sharing words get similar vectors, so retrieval, the local router and
+    the semantic answer cache behave plausibly without any model or network.
+    """
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        words = _WORD.findall(text.casefold())
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if words:
+            slots = [_slot(w, self.dim) for w in words]
+            idx = np.fromiter((s[0] for s in slots), dtype=np.int64, count=len(slots))
+            sign = np.fromiter((s[1] for s in slots), dtype=np.float32, count=len(slots))
+            vec = np.bincount(idx, weights=sign, minlength=self.dim).astype(np.float32)
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            vec[0] = 1.0
+            norm = 1.0
+        return (vec / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _text(msg: BaseMessage) -> str:
+    content = msg.content
+    if isinstance(content, str):
+        return content
+    return " ".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model for offline runs.
+
+    With bound tools it first calls ``retrieve`` (or ``web_search`` in the web
+    agent) with the last user message as query, then answers from the tool
+    result. ``with_structured_output`` fills Literal fields with the first
+    option named in the last user message (e.g. the router's route).
+    ``latency`` adds a fixed delay per call to simulate the provider.
+    """
+
+    model: str = "fake-chat"
+    latency: float = 0.0
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "latency": self.latency}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FakeChatModel":  # type: ignore[override]
+        names = [getattr(t, "name", None) or getattr(t, "__name__", str(t)) for t in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):  # type: ignore[override]
+        def run(messages: Any) -> Any:
+            time.sleep(self.latency)
+            return self._structured(schema, convert_to_messages(messages))
+
+        async def arun(messages: Any) -> Any:
+            await asyncio.sleep(self.latency)
+            return self._structured(schema, convert_to_messages(messages))
+
+        return RunnableLambda(run, afunc=arun, name="FakeStructuredOutput")
+
+    @staticmethod
+    def _last_user_text(messages: List[BaseMessage]) -> str:
+        return next((_text(m) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+    def _structured(self, schema: Any, messages: List[BaseMessage]) -> Any:
+        words = set(_WORD.findall(self._last_user_text(messages).casefold()))
+        values: Dict[str, Any] = {}
+        for name, field in schema.model_fields.items():
+            if get_origin(field.annotation) is Literal:
+                options = get_args(field.annotation)
+                values[name] = next((o for o in options if str(o).casefold() in words), options[0])
+            elif field.annotation in (str, "str"):
+                values[name] = "fake"
+        return schema(**values)
+
+    def _pick_tool(self, messages: List[BaseMessage]) -> Optional[str]:
+        system = " ".join(_text(m) for m in messages if isinstance(m, SystemMessage)).lower()
+        if "web_search" in self.tool_names and "web search" in system:
+            return "web_search"
+        if "retrieve" in self.tool_names:
+            return "retrieve"
+        return None
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1] if messages else None
+        query = self._last_user_text(messages)
+        tool = None if isinstance(last, ToolMessage) else self._pick_tool(messages)
+        if tool is not None:
+            n = sum(1 for m in messages if isinstance(m, AIMessage))
+            message = AIMessage(content="", tool_calls=[{"name": tool, "args": {"query": query}, "id": f"call_{n}"}])
+        elif isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Antwort auf Basis der Quellen: {_text(last)[:300]} [1]")
+        else:
+            message = AIMessage(content=f"Antwort: {query[:300]}")
+        prompt_tokens = sum(_estimate_tokens(_text(m)) for m in messages)
+        completion_tokens = _estimate_tokens(_text(message))
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return message
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        message = self._reply(messages)
+        usage = message.usage_metadata or {}
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "model_name": self.model,
+                "token_usage": {
+                    "prompt_tokens": usage.get("input_tokens", 0),
+                    "completion_tokens": usage.get("output_tokens", 0),
+                },
+            },
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
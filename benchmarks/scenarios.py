@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+_CHUNK_CHARS = 900  # one paragraph per chunk with the default CHUNK_SIZE=1000
+_PARAGRAPHS_PER_FILE = 500
+_TOPICS = ("vertrag", "rechnung", "wartung", "sicherheit", "datenschutz", "lieferung", "garantie", "schulung")
+
+
+def latency_summary(samples: Sequence[float]) -> Dict[str, Any]:
+    """Latency statistics in milliseconds for samples given in seconds."""
+    if not samples:
+        return {"n": 0}
+    xs = sorted(samples)
+    n = len(xs)
+
+    def pct(p: float) -> float:
+        return round(xs[min(n - 1, int(round(p * (n - 1))))] * 1000, 3)
+
+    return {
+        "n": n,
+        "mean_ms": round(sum(xs) / n * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": round(xs[0] * 1000, 3),
+        "max_ms": round(xs[-1] * 1000, 3),
+    }
+
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    letters = "abcdefghijklmnoprstuvwz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 11))) for _ in range(size)] + list(_TOPICS)
+
+
+def _paragraph(rng: random.Random, vocab: List[str], n: int) -> str:
+    words: List[str] = []
+    length = 0
+    topic = _TOPICS[n % len(_TOPICS)]
+    while length < _CHUNK_CHARS - 40:
+        word = rng.choice(vocab)
+        words.append(word)
+        length += len(word) + 1
+    # exact identifiers and a topic word give BM25 and dense retrieval something to find
+    words[rng.randrange(len(words))] = f"ART-{n:06d}"
+    words[rng.randrange(len(words))] = topic
+    return " ".join(words)[: _CHUNK_CHARS - 1] + "."
+
+
+def write_corpus(docs_dir: Path, chunks: int, *, seed: int = 0) -> int:
+    """Replace the contents of ``docs_dir`` with a synthetic corpus of about ``chunks`` chunks; returns the file count."""
+    if docs_dir.exists():
+        shutil.rmtree(docs_dir)
+    docs_dir.mkdir(parents=True)
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng)
+    files = 0
+    for start in range(0, chunks, _PARAGRAPHS_PER_FILE):
+        end = min(chunks, start + _PARAGRAPHS_PER_FILE)
+        text = "\n\n".join(_paragraph(rng, vocab, n) for n in range(start, end))
+        (docs_dir / f"synthetic_{files:05d}.txt").write_text(text, encoding="utf-8")
+        files += 1
+    return files
+
+
+def bench_build(docs_dir: Path, index_dir: Path, chunks: int) -> Dict[str, Any]:
+    from app.vectorstore.ingest import build_index
+
+    files = write_corpus(docs_dir, chunks)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    t0 = time.perf_counter()
+    result = build_index() or {}
+    elapsed = time.perf_counter() - t0
+    built = int(result.get("chunks", 0))
+    return {
+        "chunks_requested": chunks,
+        "chunks": built,
+        "files": files,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(built / elapsed, 2) if elapsed > 0 else None,
+        "throughput": result.get("throughput"),
+        "index_bytes": sum(p.stat().st_size for p in index_dir.rglob("*") if p.is_file()),
+    }
+
+
+def _queries(n: int) -> List[str]:
+    rng = random.Random(1)
+    out = []
+    for i in range(n):
+        topic = _TOPICS[i % len(_TOPICS)]
+        out.append(f"Was steht zu {topic} in ART-{rng.randrange(1000):06d}?" if i % 2 else f"Regelungen zur {topic}")
+    return out
+
+
+def _timed(fn: Callable[[], Any], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_retrieve(iterations: int, modes: Sequence[str] = ("dense", "bm25", "hybrid")) -> Dict[str, Any]:
+    from app.agents.tools import retrieve_tool
+
+    queries = _queries(iterations)
+    t0 = time.perf_counter()
+    retrieve_tool.invoke({"query": queries[0]})  # loads the index generation
+    out: Dict[str, Any] = {"cold_ms": round((time.perf_counter() - t0) * 1000, 3)}
+    for mode in modes:
+        it = iter(queries * 2)
+        out[mode] = latency_summary(_timed(lambda: retrieve_tool.invoke({"query": next(it), "mode": mode}), iterations))
+    return out
+
+
+def bench_graph(iterations: int, routes: Sequence[str] = ("direct", "rag", "web")) -> Dict[str, Any]:
+    """graph.invoke per route; the fake router picks the route named in the message."""
+    from langchain_core.messages import HumanMessage
+
+    from app.graph import get_graph
+    from app.telemetry import TelemetryCallbackHandler, request_trace
+
+    graph = get_graph()
+    out: Dict[str, Any] = {}
+    for route in routes:
+        samples: List[float] = []
+        by_kind: Dict[str, float] = {}
+        mismatches = 0
+        for i in range(iterations):
+            state = {"messages": [HumanMessage(content=f"{route}: Frage {i} zu {_TOPICS[i % len(_TOPICS)]}")]}
+            with request_trace() as trace:
+                t0 = time.perf_counter()
+                result = graph.invoke(
+                    state,
+                    config={
+                        "configurable": {"thread_id": f"bench-{route}-{i}"},
+                        "callbacks": [TelemetryCallbackHandler(trace)],
+                    },
+                )
+                samples.append(time.perf_counter() - t0)
+            mismatches += int(result.get("route") != route)
+            for kind, ms in trace.summary()["by_kind_ms"].items():
+                by_kind[kind] = by_kind.get(kind, 0.0) + ms
+        out[route] = latency_summary(samples)
+        out[route]["route_mismatches"] = mismatches
+        out[route]["mean_by_kind_ms"] = {k: round(v / iterations, 3) for k, v in sorted(by_kind.items())}
+    return out
+
+
+async def _chat_load(requests: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    from app.api.server import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async def one(client: "httpx.AsyncClient", i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                body = {"message": f"rag: Frage {i} zu {_TOPICS[i % len(_TOPICS)]}", "thread_id": f"bench-chat-{i}"}
+                response = await client.post("/chat", json=body)
+                if response.status_code != 200 or "Fehler" in response.json().get("answer", ""):
+                    errors += 1
+            except Exception:
+                errors += 1
+            samples.append(time.perf_counter() - t0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await one(client, -1)  # warm-up: index load, first model binding
+        samples.clear()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - t0
+    out = latency_summary(samples)
+    out.update(
+        {
+            "requests": requests,
+            "concurrency": concurrency,
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "requests_per_s": round(requests / elapsed, 2) if elapsed > 0 else None,
+        }
+    )
+    return out
+
+
+def bench_chat(requests: int, concurrency: int) -> Dict[str, Any]:
+    """POST /chat throughput through the ASGI app (no sockets) under concurrent load."""
+    return asyncio.run(_chat_load(requests, concurrency))